@@ -6,6 +6,7 @@ from typing import List, Dict, Any, Tuple
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.preprocessing import StandardScaler
 import librosa
+from pydub import AudioSegment
 
 class AdaptiveTrainingModule:
     """自適應訓練模組 - 整合到現有系統"""
@@ -26,8 +27,6 @@ class AdaptiveTrainingModule:
         """提取簡化的音頻特徵（減少依賴）"""
         try:
             # 使用pydub讀取音頻（已有的依賴）
-            from pydub import AudioSegment
-            
             audio = AudioSegment.from_wav(audio_path)
             
             # 轉換為numpy陣列
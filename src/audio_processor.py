@@ -1,10 +1,133 @@
 # audio_processor.py - 音頻處理模組
 import os
+import math
+import logging
+import threading
+import numpy as np
+import scipy.signal
+from pathlib import Path
+from scipy.io import wavfile
 from moviepy.editor import VideoFileClip
 from pydub import AudioSegment
-from typing import List, Tuple
+from typing import List, Dict, Tuple, Iterator, Union, Optional
 from audio_quality_processor import AudioQualityAdapter
 
+# WebRTC VAD (可選，未安裝時改用能量門檻判斷語音)
+try:
+    import webrtcvad
+    WEBRTCVAD_AVAILABLE = True
+except ImportError:
+    WEBRTCVAD_AVAILABLE = False
+
+log = logging.getLogger(__name__)
+
+def load_wav_np(audio_path: str) -> Tuple[np.ndarray, int]:
+    """讀取 WAV 為 [-1, 1] 範圍的 float32 陣列（多聲道為 (樣本, 聲道)）"""
+    sample_rate, samples = wavfile.read(audio_path)
+    if samples.dtype == np.uint8:
+        x = (samples.astype(np.float32) - 128.0) / 128.0
+    elif np.issubdtype(samples.dtype, np.integer):
+        x = samples.astype(np.float32) / float(np.iinfo(samples.dtype).max + 1)
+    else:
+        x = samples.astype(np.float32)
+    return x, sample_rate
+
+
+def dbfs_np(samples: np.ndarray) -> float:
+    """整體音量 (dBFS)，與 pydub AudioSegment.dBFS 相同定義"""
+    rms = float(np.sqrt(np.mean(np.square(samples, dtype=np.float64)))) if samples.size else 0.0
+    return 20 * math.log10(rms) if rms > 0 else -float('inf')
+
+
+def speech_ratio_np(samples: np.ndarray, sample_rate: int, min_silence_ms: int,
+                    silence_thresh_db: float) -> float:
+    """非靜音部分佔的比例，等同 pydub detect_nonsilent 的結果（視窗每 1ms 移動一次）"""
+    power = np.square(samples, dtype=np.float64)
+    if power.ndim > 1:
+        power = power.mean(axis=1)
+    if power.size == 0:
+        return 0.0
+    
+    window = int(sample_rate * min_silence_ms / 1000)
+    step = max(1, sample_rate // 1000)
+    if window <= 0 or power.size < window:
+        return 1.0
+    
+    # 以累積和計算每個視窗的均方值，低於門檻的視窗為靜音
+    cumulative = np.concatenate(([0.0], np.cumsum(power)))
+    starts = np.arange(0, power.size - window + 1, step)
+    window_power = (cumulative[starts + window] - cumulative[starts]) / window
+    silent_starts = starts[window_power < 10 ** (silence_thresh_db / 10)]
+    
+    coverage = np.zeros(power.size + 1, dtype=np.int32)
+    np.add.at(coverage, silent_starts, 1)
+    np.add.at(coverage, silent_starts + window, -1)
+    return float(np.count_nonzero(np.cumsum(coverage[:-1]) == 0)) / power.size
+
+
+def segment_quality_issue(samples: np.ndarray, sample_rate: int) -> Optional[str]:
+    """檢查片段品質，不合格時返回原因（合格返回 None）"""
+    duration_ms = len(samples) * 1000 / sample_rate
+    
+    # 檢查時長
+    if duration_ms < 2000:  # 少於2秒
+        return f"片段過短: {duration_ms/1000:.1f}s"
+    
+    # 檢查音量
+    dbfs = dbfs_np(samples)
+    if dbfs < -50:
+        return f"音量過小: {dbfs:.1f}dB"
+    
+    # 檢查是否主要是靜音
+    speech_ratio = speech_ratio_np(samples, sample_rate, min_silence_ms=300, silence_thresh_db=dbfs - 15)
+    if speech_ratio == 0:
+        return "主要是靜音"
+    if speech_ratio < 0.3:
+        return f"語音比例過低: {speech_ratio:.2f}"
+    
+    return None
+
+
+class AudioChunk:
+    """常駐記憶體的音頻片段，需要文件路徑時才寫出 WAV"""
+    
+    def __init__(self, samples: np.ndarray, sample_rate: int, start_time: float, end_time: float, path: str,
+                 temp_paths: Optional[set] = None):
+        self.samples = samples
+        self.sample_rate = sample_rate
+        self.start_time = start_time
+        self.end_time = end_time
+        self._path = path
+        self._written = False
+        self._lock = threading.Lock()
+        self._temp_paths = temp_paths  # 寫出後登記，供最後統一清理
+    
+    @property
+    def duration(self) -> float:
+        return len(self.samples) / self.sample_rate
+    
+    @property
+    def path(self) -> str:
+        """片段 WAV 路徑（第一次存取時才寫出）"""
+        with self._lock:
+            if not self._written:
+                pcm = np.clip(np.round(self.samples * 32768.0), -32768, 32767).astype(np.int16)
+                wavfile.write(self._path, self.sample_rate, pcm)
+                self._written = True
+                if self._temp_paths is not None:
+                    self._temp_paths.add(self._path)
+        return self._path
+    
+    def remove_file(self):
+        """刪除已寫出的 WAV（未寫出時不做任何事）"""
+        with self._lock:
+            if self._written:
+                Path(self._path).unlink(missing_ok=True)
+                self._written = False
+                if self._temp_paths is not None:
+                    self._temp_paths.discard(self._path)
+
+
 class AudioProcessor:
     """音頻處理器"""
     
@@ -12,15 +135,22 @@ class AudioProcessor:
         self.chunk_duration = 10  # 預設分割時間
         self.quality_adapter = AudioQualityAdapter()
         self.enable_quality_processing = True  # 可配置開關
+        self._temp_paths = set()  # 已寫出的片段文件，由 cleanup_temp_files 一次清理
     
-    def extract_audio_from_video(self, video_path: str, audio_path: str = None) -> str:
-        """從影片中提取音頻"""
+    def extract_audio_from_video(self, video_path: str, audio_path: str = None,
+                                 target_sr: Optional[int] = 16000, target_channels: Optional[int] = 1) -> str:
+        """從影片中提取音頻 - 預設直接輸出 16kHz 單聲道 16-bit PCM（Whisper 等識別引擎的輸入格式）
+
+        後續分割、品質檢查與識別讀取的資料量約為 48kHz 立體聲的六分之一；target_sr 或
+        target_channels 設為 None 時保留原始格式，由各識別引擎自行轉換。
+        """
         if audio_path is None:
             audio_path = video_path.rsplit('.', 1)[0] + '_audio.wav'
         
         try:
             print("正在提取音頻...")
-            video = VideoFileClip(video_path)
+            # 由 ffmpeg 解碼時直接重取樣（含抗混疊濾波），避免寫出時再逐點抽樣
+            video = VideoFileClip(video_path, audio_fps=target_sr) if target_sr else VideoFileClip(video_path)
             
             # 檢查是否有音軌
             if video.audio is None:
@@ -29,7 +159,16 @@ class AudioProcessor:
                 return None
                 
             audio = video.audio
-            audio.write_audiofile(audio_path, verbose=False, logger=None)
+            audio.write_audiofile(
+                audio_path,
+                fps=target_sr,  # 與讀取取樣率一致，不再重取樣；None 時沿用原始取樣率
+                nbytes=2,
+                codec='pcm_s16le',
+                ffmpeg_params=(['-ar', str(target_sr)] if target_sr else []) +
+                              (['-ac', str(target_channels)] if target_channels else []) or None,
+                verbose=False,
+                logger=None
+            )
             video.close()
             audio.close()
             print(f"音頻已提取到: {audio_path}")
@@ -41,11 +180,8 @@ class AudioProcessor:
                 
                 # 如果處理成功且文件不同，清理原始音頻文件
                 if improved_audio_path and improved_audio_path != audio_path:
-                    try:
-                        os.remove(audio_path)
-                        print(f"已清理原始音頻文件: {audio_path}")
-                    except:
-                        pass
+                    Path(audio_path).unlink(missing_ok=True)
+                    print(f"已清理原始音頻文件: {audio_path}")
                     return improved_audio_path
             
             return audio_path
@@ -57,119 +193,230 @@ class AudioProcessor:
     
     def split_audio_chunks(self, audio_path: str, chunk_duration: int = None) -> List[Tuple[str, float, float]]:
         """將音頻分割成小段以便處理"""
+        return [(chunk.path, chunk.start_time, chunk.end_time)
+                for chunk in self.iter_audio_chunks(audio_path, chunk_duration)]
+    
+    def iter_audio_chunks(self, audio_path: str, chunk_duration: int = None,
+                          skip_low_quality: bool = False) -> Iterator[AudioChunk]:
+        """逐段分割音頻，每切出一個片段即交出（供邊分割邊識別，片段不寫入磁碟；可略過品質不足的片段）"""
         if chunk_duration is None:
             chunk_duration = self.chunk_duration
             
         try:
-            audio = AudioSegment.from_wav(audio_path)
+            samples, sample_rate = load_wav_np(audio_path)
+            total_ms = len(samples) * 1000 // sample_rate
             chunk_length_ms = chunk_duration * 1000
-            chunks = []
+            count = 0
             
-            for i, start_time in enumerate(range(0, len(audio), chunk_length_ms)):
-                end_time = min(start_time + chunk_length_ms, len(audio))
-                chunk = audio[start_time:end_time]
+            for i, start_time in enumerate(range(0, total_ms, chunk_length_ms)):
+                end_time = min(start_time + chunk_length_ms, total_ms)
+                chunk = self._slice_chunk(samples, sample_rate, start_time, end_time, f"temp_chunk_{i}.wav")
+                if skip_low_quality and not self._passes_quality(chunk):
+                    continue
                 
-                chunk_path = f"temp_chunk_{i}.wav"
-                chunk.export(chunk_path, format="wav")
-                
-                chunks.append((chunk_path, start_time / 1000.0, end_time / 1000.0))
+                count += 1
+                yield chunk
             
-            print(f"   音頻分割完成，共 {len(chunks)} 個片段")
-            return chunks
+            print(f"   音頻分割完成，共 {count} 個片段")
         except Exception as e:
             print(f"分割音頻失敗: {e}")
-            return []
     
     def split_audio_with_overlap(self, audio_path: str, segment_duration: int = 10, 
                                 overlap_duration: int = 2) -> List[Tuple[str, float, float]]:
         """重疊分割音頻 - 避免特殊詞語被切斷"""
+        return [(chunk.path, chunk.start_time, chunk.end_time)
+                for chunk in self.iter_audio_with_overlap(audio_path, segment_duration, overlap_duration)]
+    
+    def iter_audio_with_overlap(self, audio_path: str, segment_duration: int = 10,
+                                overlap_duration: int = 2, skip_low_quality: bool = False) -> Iterator[AudioChunk]:
+        """逐段重疊分割音頻，每切出一個片段即交出"""
         try:
-            audio = AudioSegment.from_wav(audio_path)
+            samples, sample_rate = load_wav_np(audio_path)
+            total_ms = len(samples) * 1000 // sample_rate
             segment_length_ms = segment_duration * 1000
             overlap_length_ms = overlap_duration * 1000
             step_length_ms = segment_length_ms - overlap_length_ms
             
-            segments = []
+            count = 0
             
-            for i, start_ms in enumerate(range(0, len(audio), step_length_ms)):
-                end_ms = min(start_ms + segment_length_ms, len(audio))
+            for i, start_ms in enumerate(range(0, total_ms, step_length_ms)):
+                end_ms = min(start_ms + segment_length_ms, total_ms)
+                chunk = self._slice_chunk(samples, sample_rate, start_ms, end_ms, f"temp_segment_{i}.wav")
+                if skip_low_quality and not self._passes_quality(chunk):
+                    continue
                 
-                # 提取片段
-                segment = audio[start_ms:end_ms]
-                segment_path = f"temp_segment_{i}.wav"
-                segment.export(segment_path, format="wav")
+                count += 1
+                yield chunk
+            
+            print(f"   重疊分割完成，共 {count} 個片段（重疊 {overlap_duration} 秒）")
+            
+        except Exception as e:
+            print(f"重疊分割失敗: {e}")
+    
+    def split_audio_with_vad(self, audio_path: str, min_sil: float = 0.1, max_len: float = 30.0,
+                             min_len: float = 2.0) -> List[Tuple[str, float, float]]:
+        """依語音活動分割音頻 - 只在靜音處切開，片段盡量長但不超過 max_len 秒"""
+        return [(chunk.path, chunk.start_time, chunk.end_time)
+                for chunk in self.iter_audio_with_vad(audio_path, min_sil, max_len, min_len)]
+    
+    def iter_audio_with_vad(self, audio_path: str, min_sil: float = 0.1, max_len: float = 30.0,
+                            min_len: float = 2.0) -> Iterator[AudioChunk]:
+        """逐段依語音活動分割音頻，每切出一個片段即交出"""
+        try:
+            samples, sample_rate = load_wav_np(audio_path)
+            total_ms = len(samples) * 1000 // sample_rate
+            frame_ms = 30
+            speech = self._detect_speech_frames(samples, sample_rate, frame_ms)
+            
+            min_sil_frames = max(1, math.ceil(min_sil * 1000 / frame_ms))
+            long_gap_frames = max(min_sil_frames, math.ceil(1000 / frame_ms))  # 超過 1 秒的停頓一律切開
+            min_frames = int(min_len * 1000 / frame_ms)
+            max_frames = max(1, int(max_len * 1000 / frame_ms))
+            min_speech_frames = math.ceil(300 / frame_ms)  # 語音少於 0.3 秒的片段視為雜訊
+            
+            # 以幀為單位找出 (起點, 終點, 語音幀數)
+            ranges = []
+            start, silence_run, voiced = None, 0, 0
+            for i, is_speech in enumerate(speech):
+                if start is None:
+                    if is_speech:
+                        start, silence_run, voiced = i, 0, 1
+                    continue
                 
-                start_sec = start_ms / 1000.0
-                end_sec = end_ms / 1000.0
+                if is_speech:
+                    silence_run = 0
+                    voiced += 1
+                else:
+                    silence_run += 1
                 
-                segments.append((segment_path, start_sec, end_sec))
+                length = i + 1 - start
+                if length >= max_frames:
+                    ranges.append((start, i + 1, voiced))
+                    start = None
+                elif silence_run >= long_gap_frames or (silence_run >= min_sil_frames and
+                                                        length - silence_run >= min_frames):
+                    # 保留 min_sil 長度的停頓，避免切到詞尾
+                    ranges.append((start, i + 1 - silence_run + min_sil_frames, voiced))
+                    start = None
+            if start is not None:
+                ranges.append((start, len(speech) - silence_run, voiced))
             
-            print(f"   重疊分割完成，共 {len(segments)} 個片段（重疊 {overlap_duration} 秒）")
-            return segments
+            count = 0
+            for start_frame, end_frame, voiced in ranges:
+                if voiced < min_speech_frames:
+                    continue
+                start_ms = start_frame * frame_ms
+                end_ms = min(end_frame * frame_ms, total_ms)
+                
+                chunk_path = f"temp_vad_{count}.wav"
+                count += 1
+                yield self._slice_chunk(samples, sample_rate, start_ms, end_ms, chunk_path)
+            
+            print(f"   語音活動分割完成，共 {count} 個片段")
             
         except Exception as e:
-            print(f"重疊分割失敗: {e}")
+            print(f"語音活動分割失敗: {e}")
+    
+    def _passes_quality(self, chunk: AudioChunk) -> bool:
+        """分割時的品質預篩，不合格的片段不進入識別流程"""
+        issue = segment_quality_issue(chunk.samples, chunk.sample_rate)
+        if issue:
+            log.info("   略過片段 %.1fs - %.1fs: %s", chunk.start_time, chunk.end_time, issue)
+            return False
+        return True
+    
+    def _slice_chunk(self, samples: np.ndarray, sample_rate: int, start_ms: int, end_ms: int,
+                     path: str) -> AudioChunk:
+        """依毫秒範圍切出片段（共用原始陣列，不複製）"""
+        return AudioChunk(samples[start_ms * sample_rate // 1000:end_ms * sample_rate // 1000],
+                          sample_rate, start_ms / 1000.0, end_ms / 1000.0, path, self._temp_paths)
+    
+    def _detect_speech_frames(self, samples: np.ndarray, sample_rate: int, frame_ms: int = 30) -> List[bool]:
+        """逐幀判斷是否為語音（samples 為 load_wav_np 讀出的 float32 陣列）"""
+        mono = samples.mean(axis=1) if samples.ndim > 1 else samples
+        
+        if WEBRTCVAD_AVAILABLE:
+            # WebRTC VAD 只接受 8/16/32/48 kHz 的 16-bit 單聲道
+            if sample_rate != 16000:
+                mono = scipy.signal.resample_poly(mono, 16000, sample_rate)
+            vad = webrtcvad.Vad(2)
+            frame_bytes = int(16000 * frame_ms / 1000) * 2
+            raw = np.clip(mono * 32768.0, -32768, 32767).astype(np.int16).tobytes()
+            return [vad.is_speech(raw[offset:offset + frame_bytes], 16000)
+                    for offset in range(0, len(raw) - frame_bytes + 1, frame_bytes)]
+        
+        # 能量門檻：與片段品質檢查相同，低於整體音量 15 dB 視為靜音
+        frame_len = int(sample_rate * frame_ms / 1000)
+        n_frames = len(mono) // frame_len
+        if n_frames == 0:
             return []
+        frame_power = np.mean(np.square(mono[:n_frames * frame_len], dtype=np.float64).reshape(n_frames, frame_len),
+                              axis=1)
+        threshold = np.mean(frame_power) * 10 ** (-15 / 10)
+        return (frame_power > threshold).tolist()
     
-    def find_word_timing_in_segment(self, audio_segment_path: str, text: str, 
+    def find_word_timing_in_segment(self, audio_segment: Union[str, AudioChunk], text: str, 
                                    target_word: str, segment_start_time: float) -> List[Tuple[float, float]]:
-        """在音頻片段中找到特定詞彙的精確時間位置"""
+        """在音頻片段中找到特定詞彙的精確時間位置（可傳入路徑或記憶體中的片段）"""
+        return self.find_word_timings_in_segment(audio_segment, text, [target_word],
+                                                 segment_start_time).get(target_word, [])
+    
+    def find_word_timings_in_segment(self, audio_segment: Union[str, AudioChunk], text: str,
+                                     target_words: List[str], segment_start_time: float) -> Dict[str, List[Tuple[float, float]]]:
+        """一次定位片段中多個詞彙的時間位置，返回 {詞彙: [(開始, 結束), ...]}"""
         try:
-            # 估算詞彙在片段內的相對時間
-            audio = AudioSegment.from_wav(audio_segment_path)
-            segment_duration = len(audio) / 1000.0
-            
-            # 根據特殊詞語長度估算發音時間
-            word_length = len(target_word)
-            if word_length <= 2:
-                estimated_duration = 0.6
-            elif word_length <= 4:
-                estimated_duration = 1.2
+            # 片段時長只取得一次，所有詞彙共用
+            if isinstance(audio_segment, AudioChunk):
+                segment_duration = audio_segment.duration
             else:
-                estimated_duration = 1.8
+                segment_duration = len(AudioSegment.from_wav(audio_segment)) / 1000.0
             
-            # 在文字中找到特殊詞語位置
             text_lower = text.lower()
-            target_lower = target_word.lower()
-            
-            word_timings = []
-            start_pos = 0
+            total_chars = len(text_lower)
             
-            while True:
-                pos = text_lower.find(target_lower, start_pos)
-                if pos == -1:
-                    break
+            timings = {}
+            for target_word in target_words:
+                # 根據特殊詞語長度估算發音時間
+                word_length = len(target_word)
+                if word_length <= 2:
+                    estimated_duration = 0.6
+                elif word_length <= 4:
+                    estimated_duration = 1.2
+                else:
+                    estimated_duration = 1.8
                 
-                # 計算在片段內的相對位置
-                chars_before = pos
-                total_chars = len(text_lower)
+                # 在文字中找到特殊詞語位置
+                target_lower = target_word.lower()
+                word_timings = []
+                start_pos = 0
                 
-                # 片段內的相對時間
-                relative_start = (chars_before / total_chars) * segment_duration
-                relative_end = min(relative_start + estimated_duration, segment_duration)
+                while True:
+                    pos = text_lower.find(target_lower, start_pos)
+                    if pos == -1:
+                        break
+                    
+                    # 片段內的相對時間
+                    relative_start = (pos / total_chars) * segment_duration
+                    relative_end = min(relative_start + estimated_duration, segment_duration)
+                    
+                    # 轉換為絕對時間
+                    word_timings.append((segment_start_time + relative_start, segment_start_time + relative_end))
+                    start_pos = pos + 1
                 
-                # 轉換為絕對時間
-                absolute_start = segment_start_time + relative_start
-                absolute_end = segment_start_time + relative_end
-                
-                word_timings.append((absolute_start, absolute_end))
-                start_pos = pos + 1
+                timings[target_word] = word_timings
             
-            return word_timings
+            return timings
             
         except Exception as e:
-            print(f"詞彙定位失敗: {e}")
-            return []
+            log.warning("詞彙定位失敗: %s", e)
+            return {}
     
     def cleanup_temp_files(self, pattern: str = "temp_"):
-        """清理臨時文件"""
+        """清理臨時文件（只處理本處理器寫出的片段，不必掃描目錄）"""
         try:
-            for f in os.listdir('.'):
-                if f.startswith(pattern) and (f.endswith('.wav') or f.endswith('.mp4')):
-                    try:
-                        os.remove(f)
-                    except:
-                        pass
+            for path in [p for p in self._temp_paths if os.path.basename(p).startswith(pattern)]:
+                Path(path).unlink(missing_ok=True)
+                self._temp_paths.discard(path)
             print("臨時文件清理完成")
-        except Exception as e:
+        except OSError as e:
             print(f"清理臨時文件失敗: {e}")
\ No newline at end of file
@@ -14,6 +14,7 @@ class ConfigManager:
             "chunk_duration": 10,
             "use_overlap_segments": False,
             "overlap_duration": 2,
+            "use_vad_segments": False,
             
             # 語音識別設定
             "language": "chinese",
@@ -1,43 +1,56 @@
 # enhanced_profanity_detector.py - 整合訓練功能的特殊詞語檢測器
 import os
 import re
+import functools
 from typing import List, Dict, Tuple
 from adaptive_training_module import AdaptiveTrainingModule
+# 與 ProfanityDetector 共用標點刪除表，兩個檢測器的正規化保持一致
+from profanity_detector import PUNCTUATION_TABLE
+
+# 原有的規則檢測詞庫 - 所有實例共用
+_DEFAULT_PROFANITY = (
+    "幹",
+    "甘",
+    "干",
+    "幹你",
+    "操你",
+    "靠北",
+    "幹你娘",
+    "操你媽",
+    "衝三小",
+    "甘霖娘",
+    "幹哩娘",
+    "幹你老師",
+    "操你全家",
+    "你好我是Google小姐",  # 測試用
+)
+
+# 模糊匹配模式
+_DEFAULT_PATTERNS = {
+    "幹你娘": (r"[幹干乾甘][你泥妳尼][娘涼良梁]",),
+    "操你媽": (r"[操草曹][你泥妳尼][媽馬麻母嗎]",),
+    "幹你老師": (r"[幹干乾甘][你泥妳尼][老][師]",),
+    "靠北": (r"[靠考烤][北杯背悲]",),
+}
+
+# 模式字串只編譯一次，所有實例共用（含實例自行新增的模式）
+_compile_pattern = functools.cache(re.compile)
+
 
 class EnhancedProfanityDetector:
     """增強的特殊詞語檢測器 - 整合自適應訓練"""
     
     def __init__(self):
         # 原有的規則檢測
-        self.profanity_words = {
-            "幹": ["beep"], 
-            "甘": ["beep"],
-            "干": ["beep"],
-            "幹你": ["beep"],
-            "操你": ["beep"],
-            "靠北": ["beep"],
-            "幹你娘": ["beep"],
-            "操你媽": ["beep"],
-            "衝三小": ["beep"],
-            "甘霖娘": ["beep"],
-            "幹哩娘": ["beep"],
-            "幹你老師": ["beep"],
-            "操你全家": ["beep"],
-            "你好我是Google小姐": ["beep"],  # 測試用
-        }
+        self.profanity_words = {word: ["beep"] for word in _DEFAULT_PROFANITY}
         
         # 新增：自適應訓練模組
         self.adaptive_trainer = AdaptiveTrainingModule()
         self.use_adaptive_detection = False
         self.adaptive_weight = 0.3  # 自適應檢測的權重
         
-        # 模糊匹配模式
-        self.profanity_patterns = {
-            "幹你娘": [r"[幹干乾甘][你泥妳尼][娘涼良梁]"],
-            "操你媽": [r"[操草曹][你泥妳尼][媽馬麻母嗎]"],
-            "幹你老師": [r"[幹干乾甘][你泥妳尼][老][師]"],
-            "靠北": [r"[靠考烤][北杯背悲]"],
-        }
+        # 模糊匹配模式（每個實例各自一份，修改時不影響其他實例）
+        self.profanity_patterns = {profanity: list(patterns) for profanity, patterns in _DEFAULT_PATTERNS.items()}
     
     def detect_profanity_basic(self, text: str) -> List[str]:
         """基本特殊詞語檢測（原有功能）"""
@@ -53,11 +66,11 @@ class EnhancedProfanityDetector:
     def detect_profanity_fuzzy(self, text: str) -> List[str]:
         """模糊匹配特殊詞語檢測（原有功能）"""
         found_profanity = []
-        text_clean = re.sub(r'[^\w\s]', '', text.lower())
+        text_clean = text.lower().translate(PUNCTUATION_TABLE)
         
         for profanity, patterns in self.profanity_patterns.items():
             for pattern in patterns:
-                if re.search(pattern, text_clean):
+                if _compile_pattern(pattern).search(text_clean):
                     found_profanity.append(profanity)
                     break
         
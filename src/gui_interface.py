@@ -672,7 +672,7 @@ class FilterGUI:
             self.root.update()
             
             def load_whisper():
-                success = self.filter.speech_engine.load_whisper_model(
+                success = self.filter.load_whisper_model(
                     self.whisper_model_size.get().split()[0]  # 取出模型名稱
                 )
                 
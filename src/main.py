@@ -10,7 +10,8 @@
 """
 
 import os
-from video_processor import VideoProfanityFilter
+import logging
+from video_processor import VideoProfanityFilter, setup_queue_logging
 from gui_interface import create_gui
 
 
@@ -46,6 +47,12 @@ def main():
 
 
 if __name__ == "__main__":
+    # 逐片段進度為 INFO、檢測細節為 DEBUG 等級，例如 PROFANITY_LOG_LEVEL=INFO
+    # 紀錄經佇列由背景執行緒寫出，工作執行緒不會卡在終端輸出
+    log_level = os.environ.get("PROFANITY_LOG_LEVEL", "WARNING").upper()
+    setup_queue_logging(getattr(logging, log_level, logging.WARNING),
+                        fmt="%(levelname)s %(name)s: %(message)s")
+    
     print("影片語音特殊詞語過濾器")
     print("1. 命令行版本")
     print("2. GUI版本")
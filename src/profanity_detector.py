@@ -1,112 +1,450 @@
 # profanity_detector.py - 整合訓練功能的特殊詞語檢測器
 import os
 import re
-from typing import List, Dict, Tuple
+import copy
+import functools
+import logging
+import numpy as np
+from dataclasses import dataclass
+from typing import List, Dict, Tuple, Optional
 from adaptive_training_module import AdaptiveTrainingModule
 
+# Numba (可選，用於加速模糊匹配掃描)
+try:
+    from numba import njit, prange
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+# pyahocorasick (可選，以 C 實作的 Aho-Corasick 自動機進行詞庫匹配，未安裝時使用字典樹)
+try:
+    import ahocorasick
+    AHOCORASICK_AVAILABLE = True
+except ImportError:
+    AHOCORASICK_AVAILABLE = False
+
+log = logging.getLogger(__name__)
+
+# 模糊模式中的字面片段不可含有這些正則符號
+_REGEX_META = set('.^$*+?{}[]\\|()')
+
+
+def _pattern_to_parts(pattern: str) -> Optional[Tuple[str, ...]]:
+    """將 "幹.*你.*娘" 形式的模式轉為字面片段序列，無法轉換時返回 None"""
+    parts = tuple(part for part in pattern.split('.*') if part)
+    if not parts or any(c in _REGEX_META for part in parts for c in part):
+        return None
+    return parts
+
+
+def _match_parts(text: str, parts: Tuple[str, ...]) -> bool:
+    """依序尋找各片段（等同於 re.search("A.*B.*C")：".*" 不跨越換行）"""
+    if '\n' in text:
+        return any(_match_parts(line, parts) for line in text.split('\n'))
+    pos = 0
+    for part in parts:
+        pos = text.find(part, pos)
+        if pos == -1:
+            return False
+        pos += len(part)
+    return True
+
+
+class _PunctuationTable(dict):
+    """str.translate 用的標點刪除表，等同 re.sub(r'[^\\w\\s]', '', ...)（碼位第一次出現時才判斷並記錄）"""
+
+    def __missing__(self, code: int) -> Optional[int]:
+        char = chr(code)
+        value = code if char.isalnum() or char == '_' or char.isspace() else None
+        self[code] = value
+        return value
+
+
+# 移除標點符號（與 EnhancedProfanityDetector 共用）
+PUNCTUATION_TABLE = _PunctuationTable()
+
+
+@dataclass(frozen=True)
+class NormalizedText:
+    """預先正規化的 ASR 文字，供基本與模糊檢測共用"""
+    lower: str
+    clean: str
+
+    @classmethod
+    def from_text(cls, text: str) -> 'NormalizedText':
+        lower = text.lower()
+        return cls(lower=lower, clean=lower.translate(PUNCTUATION_TABLE))
+
+
+# 字典樹的詞尾標記（空字串不可能是單一字元，不會與子節點衝突）
+_TRIE_END = ''
+
+
+def _trie_insert(trie: Dict, word: str):
+    """將詞語加入字元字典樹"""
+    node = trie
+    for char in word:
+        node = node.setdefault(char, {})
+    node[_TRIE_END] = word
+
+
+def _build_trie(words) -> Dict:
+    """以所有詞語建立字元字典樹（共用 "幹你"、"幹你娘" 等前綴）"""
+    trie = {}
+    for word in words:
+        _trie_insert(trie, word)
+    return trie
+
+
+def _trie_find_all(trie: Dict, text: str) -> List[str]:
+    """單次掃描文字，返回出現過的所有詞語（依首次出現順序）"""
+    found = {}
+    text_length = len(text)
+    for i in range(text_length):
+        node = trie
+        j = i
+        while j < text_length and text[j] in node:
+            node = node[text[j]]
+            if _TRIE_END in node:
+                found.setdefault(node[_TRIE_END], None)
+            j += 1
+    return list(found)
+
+
+def _trie_find_first(trie: Dict, text: str) -> Optional[str]:
+    """掃描到第一個出現的詞語即返回（沒有時返回 None）"""
+    text_length = len(text)
+    for i in range(text_length):
+        node = trie
+        j = i
+        while j < text_length and text[j] in node:
+            node = node[text[j]]
+            if _TRIE_END in node:
+                return node[_TRIE_END]
+            j += 1
+    return None
+
+
+def _build_automaton(words):
+    """以所有詞語建立 Aho-Corasick 自動機（單次掃描，與詞庫大小無關）"""
+    automaton = ahocorasick.Automaton()
+    for word in words:
+        automaton.add_word(word, word)
+    automaton.make_automaton()
+    return automaton
+
+
+def _automaton_find_all(automaton, text: str) -> List[str]:
+    """返回出現過的所有詞語（與 _trie_find_all 相同：依開始位置、再依長度排序）"""
+    first = {}
+    for end, word in automaton.iter(text):
+        first.setdefault(word, (end - len(word) + 1, len(word)))
+    return sorted(first, key=first.__getitem__)
+
+
+def _encode_codepoints(text: str) -> np.ndarray:
+    """將字串轉為 int32 碼位陣列"""
+    return np.frombuffer(text.encode('utf-32-le'), dtype=np.int32)
+
+
+if NUMBA_AVAILABLE:
+    @njit(cache=True)
+    def _scan_one(text_cps, patterns_flat, pattern_offsets, part_ends, out_row):
+        """掃描單一文字的所有模式；part_ends 標記每個片段的結尾位置"""
+        n_text = text_cps.shape[0]
+        n_patterns = pattern_offsets.shape[0] - 1
+        for p in range(n_patterns):
+            pos = 0
+            part_start = pattern_offsets[p]
+            matched = True
+            while part_start < pattern_offsets[p + 1]:
+                part_end = part_ends[part_start]
+                part_len = part_end - part_start
+                found = -1
+                for i in range(pos, n_text - part_len + 1):
+                    ok = True
+                    for k in range(part_len):
+                        if text_cps[i + k] != patterns_flat[part_start + k]:
+                            ok = False
+                            break
+                    if ok:
+                        found = i
+                        break
+                if found == -1:
+                    matched = False
+                    break
+                pos = found + part_len
+                part_start = part_end
+            out_row[p] = matched
+
+    @njit(cache=True, parallel=True)
+    def _scan_all(chunks_flat, chunk_offsets, patterns_flat, pattern_offsets, part_ends):
+        """批次掃描多個 ASR 片段，返回 (片段數, 模式數) 的命中矩陣"""
+        n_chunks = chunk_offsets.shape[0] - 1
+        n_patterns = pattern_offsets.shape[0] - 1
+        result = np.zeros((n_chunks, n_patterns), dtype=np.bool_)
+        for c in prange(n_chunks):
+            _scan_one(chunks_flat[chunk_offsets[c]:chunk_offsets[c + 1]],
+                      patterns_flat, pattern_offsets, part_ends, result[c])
+        return result
+
+
+class _SubsequenceScanner:
+    """模糊模式的子序列掃描器（可用 Numba 且文字數量夠多時以原生碼批次執行）"""
+
+    # 少於此數量的文字直接以 str.find 掃描：單段檢測啟動平行執行緒池（及首次編譯）反而較慢
+    NATIVE_MIN_TEXTS = 32
+
+    def __init__(self, profanity_patterns: Dict[str, List[str]]):
+        # (特殊詞語, 原始模式, 字面片段) - 無法轉換的模式保留正則
+        self.entries = []
+        for profanity, patterns in profanity_patterns.items():
+            for pattern in patterns:
+                parts = _pattern_to_parts(pattern)
+                regex = re.compile(pattern) if parts is None else None
+                self.entries.append((profanity, pattern, parts, regex))
+
+        self._native_ids = [i for i, entry in enumerate(self.entries) if entry[2] is not None]
+
+        if NUMBA_AVAILABLE and self._native_ids:
+            flat, offsets, part_ends = [], [0], []
+            for i in self._native_ids:
+                for part in self.entries[i][2]:
+                    end = len(flat) + len(part)
+                    flat.extend(ord(c) for c in part)
+                    part_ends.extend([end] * len(part))
+                offsets.append(len(flat))
+            self._patterns_flat = np.array(flat, dtype=np.int32)
+            self._pattern_offsets = np.array(offsets, dtype=np.int64)
+            self._part_ends = np.array(part_ends, dtype=np.int64)
+
+    def first_match(self, text: str) -> Optional[str]:
+        """依 entries 順序檢查，返回第一個命中模式的特殊詞語（沒有時返回 None）"""
+        for profanity, _, parts, regex in self.entries:
+            if regex.search(text) if regex is not None else _match_parts(text, parts):
+                return profanity
+        return None
+
+    def scan(self, texts: List[str]) -> List[List[int]]:
+        """返回每個文字命中的模式編號（按 entries 順序）"""
+        if NUMBA_AVAILABLE and self._native_ids and len(texts) >= self.NATIVE_MIN_TEXTS:
+            # 逐行掃描（".*" 不跨越換行），再合併回各文字
+            lines = [t.split('\n') for t in texts]
+            encoded = [_encode_codepoints(line) for text_lines in lines for line in text_lines]
+            chunk_offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+            chunk_offsets[1:] = np.cumsum([len(e) for e in encoded])
+            chunks_flat = np.concatenate(encoded) if chunk_offsets[-1] else np.zeros(0, dtype=np.int32)
+            line_hits = _scan_all(chunks_flat, chunk_offsets, self._patterns_flat,
+                                  self._pattern_offsets, self._part_ends)
+            text_starts = np.zeros(len(lines), dtype=np.int64)
+            text_starts[1:] = np.cumsum([len(text_lines) for text_lines in lines])[:-1]
+            native_hits = np.logical_or.reduceat(line_hits, text_starts, axis=0)
+        else:
+            native_hits = None
+
+        results = []
+        for row, text in enumerate(texts):
+            hits = set()
+            if native_hits is not None:
+                hits.update(self._native_ids[j] for j in np.flatnonzero(native_hits[row]))
+            for i, (_, _, parts, regex) in enumerate(self.entries):
+                if regex is not None:
+                    if regex.search(text):
+                        hits.add(i)
+                elif native_hits is None and _match_parts(text, parts):
+                    hits.add(i)
+            results.append(sorted(hits))
+        return results
+
+
+# 預設特殊詞語詞庫 (包含不同長度) - 所有實例共用
+_DEFAULT_PROFANITY = (
+    # 一字特殊詞語
+    "幹",
+    "甘",
+    "干",
+
+    # 二字特殊詞語
+    "幹你",
+    "操你",
+    "靠北",
+    
+    # 三字特殊詞語
+    "幹你娘",
+    "操你媽",
+    "衝三小",
+    "甘霖娘",
+    "幹哩娘",
+    "幹哩涼",
+    "幹尼娘",
+    "幹你涼",
+
+    # 四字特殊詞語
+    "幹你老師",
+    "操你全家",
+    "幹你老母",
+    "白痴智障",
+    
+    # 五字特殊詞語
+    "幹你娘機掰",
+    "操你媽的逼",
+
+    # Test
+    "你好我是Google小姐",
+)
+
+# 模糊匹配模式
+_DEFAULT_PATTERNS = (
+    ("幹你娘", (
+        r"幹.*你.*娘",      # 幹-你-娘 (有停頓)
+        r"幹.*娘",          # 幹-娘 (省略你)
+        r"干.*你.*娘",      # 錯字識別
+        r"乾.*你.*娘",      # 同音字
+        r"幹.*泥.*娘",      # 口音變化
+        r"幹.*妳.*娘",      # 注音輸入法
+    )),
+    ("操你媽", (
+        r"操.*你.*媽",
+        r"操.*妳.*媽",
+        r"草.*你.*媽",      # 同音字
+        r"操.*你.*馬",      # 諧音
+        r"操.*媽",
+        r"操.*你.*母",
+    )),
+    ("幹你老師", (
+        r"幹.*你.*老.*師",
+        r"幹.*老.*師",
+        r"乾.*你.*老.*師",
+        r"幹.*泥.*老.*師",
+    )),
+    ("靠北", (
+        r"靠.*北",
+        r"考.*北",
+        r"靠.*杯",
+        r"cao.*bei",        # 英文輸入
+    )),
+)
+
+
 class ProfanityDetector:
     """特殊詞語檢測器"""
     
     def __init__(self):
         # 特殊詞語詞庫 (包含不同長度)
-        self.profanity_words = {
-            # 一字特殊詞語
-            "幹": ["beep"], 
-            "甘": ["beep"],
-            "干": ["beep"],
-
-            # 二字特殊詞語
-            "幹你": ["beep"],
-            "操你": ["beep"],
-            "靠北": ["beep"],
-            
-            # 三字特殊詞語
-            "幹你娘": ["beep"],
-            "操你媽": ["beep"],
-            "衝三小": ["beep"],
-            "甘霖娘": ["beep"],
-            "幹哩娘": ["beep"],
-            "幹哩涼": ["beep"],
-            "幹尼娘": ["beep"],
-            "幹你涼": ["beep"],
-
-            # 四字特殊詞語
-            "幹你老師": ["beep"],
-            "操你全家": ["beep"],
-            "幹你老母": ["beep"],
-            "白痴智障": ["beep"],
-            
-            # 五字特殊詞語
-            "幹你娘機掰": ["beep"],
-            "操你媽的逼": ["beep"],
-
-            # Test
-            "你好我是Google小姐": ["beep"],
-        }
+        self.profanity_words = {word: ["beep"] for word in _DEFAULT_PROFANITY}
+        # 字典樹在實例間共用，新增自定義詞語時才複製
+        self._profanity_trie = self._shared_trie()
+        self._trie_is_shared = True
+        # 已安裝 pyahocorasick 時改用自動機，詞庫變更後第一次檢測時才重建
+        self._automaton = self._shared_automaton() if AHOCORASICK_AVAILABLE else None
         
         # 新增：自適應訓練模組
         self.adaptive_trainer = AdaptiveTrainingModule()
         self.use_adaptive_detection = False
         self.adaptive_weight = 0.7  # 自適應檢測的權重
+        self.early_exit_threshold = 0.8  # 文字檢測信心度達此值時略過自適應檢測
         
-        # 模糊匹配模式
-        self.profanity_patterns = {
-            "幹你娘": [
-                r"幹.*你.*娘",      # 幹-你-娘 (有停頓)
-                r"幹.*娘",          # 幹-娘 (省略你)
-                r"干.*你.*娘",      # 錯字識別
-                r"乾.*你.*娘",      # 同音字
-                r"幹.*泥.*娘",      # 口音變化
-                r"幹.*妳.*娘",      # 注音輸入法
-            ],
-            "操你媽": [
-                r"操.*你.*媽",
-                r"操.*妳.*媽",
-                r"草.*你.*媽",      # 同音字
-                r"操.*你.*馬",      # 諧音
-                r"操.*媽",
-                r"操.*你.*母",
-            ],
-            "幹你老師": [
-                r"幹.*你.*老.*師",
-                r"幹.*老.*師",
-                r"乾.*你.*老.*師",
-                r"幹.*泥.*老.*師",
-            ],
-            "靠北": [
-                r"靠.*北",
-                r"考.*北",
-                r"靠.*杯",
-                r"cao.*bei",        # 英文輸入
-            ]
-        }
+        # 模糊匹配模式（每個實例各自一份，可直接修改）
+        self.profanity_patterns = {profanity: list(patterns) for profanity, patterns in _DEFAULT_PATTERNS}
+        # 模式相同的實例共用掃描器；profanity_patterns 被修改時才重建
+        self._fuzzy_scanner = self._shared_fuzzy_scanner(_DEFAULT_PATTERNS)
+        self._fuzzy_scanner_key = _DEFAULT_PATTERNS
+        
+        # 文字檢測結果快取（ASR 常在相鄰片段輸出相同短句）
+        self._detect_text_matches = functools.lru_cache(maxsize=4096)(self._detect_text_matches_uncached)
+    
+    @classmethod
+    @functools.cache
+    def _shared_trie(cls) -> Dict:
+        """預設詞庫的字典樹（只建立一次）"""
+        return _build_trie(_DEFAULT_PROFANITY)
+    
+    @classmethod
+    @functools.cache
+    def _shared_automaton(cls):
+        """預設詞庫的 Aho-Corasick 自動機（只建立一次）"""
+        return _build_automaton(_DEFAULT_PROFANITY)
+    
+    def _word_automaton(self):
+        """目前詞庫的自動機（詞庫變更後延遲重建）"""
+        automaton = self._automaton
+        if automaton is None:
+            automaton = self._automaton = _build_automaton(self.profanity_words)
+        return automaton
+    
+    def _find_words(self, text: str) -> List[str]:
+        """詞庫精確匹配，返回出現過的所有詞語"""
+        if AHOCORASICK_AVAILABLE:
+            return _automaton_find_all(self._word_automaton(), text)
+        return _trie_find_all(self._profanity_trie, text)
+    
+    def _find_first_word(self, text: str) -> Optional[str]:
+        """詞庫精確匹配，找到第一個詞語即返回（沒有時返回 None）"""
+        if AHOCORASICK_AVAILABLE:
+            return next((word for _, word in self._word_automaton().iter(text)), None)
+        return _trie_find_first(self._profanity_trie, text)
+    
+    @classmethod
+    @functools.cache
+    def _shared_fuzzy_scanner(cls, patterns: Tuple[Tuple[str, Tuple[str, ...]], ...]) -> _SubsequenceScanner:
+        """模糊模式的掃描器（相同模式只編譯一次）"""
+        return _SubsequenceScanner(dict(patterns))
+    
+    def _current_fuzzy_scanner(self) -> _SubsequenceScanner:
+        """目前 profanity_patterns 的掃描器；模式被修改時換用新的掃描器並清除文字檢測快取"""
+        key = tuple((profanity, tuple(patterns)) for profanity, patterns in self.profanity_patterns.items())
+        if key != self._fuzzy_scanner_key:
+            self._fuzzy_scanner = self._shared_fuzzy_scanner(key)
+            self._fuzzy_scanner_key = key
+            self._detect_text_matches.cache_clear()
+        return self._fuzzy_scanner
     
     def detect_profanity_basic(self, text: str) -> List[str]:
         """基本特殊詞語檢測"""
-        found_profanity = []
-        text_lower = text.lower()
-        
-        for profanity in self.profanity_words.keys():
-            if profanity in text_lower:
-                found_profanity.append(profanity)
-        
-        return found_profanity
+        return self._detect_basic_normalized(NormalizedText.from_text(text))
+    
+    def _detect_basic_normalized(self, normalized: NormalizedText) -> List[str]:
+        """基本特殊詞語檢測（已正規化文字）"""
+        # 自動機（或字典樹）多模式匹配，單次掃描而非逐詞搜尋
+        return self._find_words(normalized.lower)
     
     def detect_profanity_fuzzy(self, text: str) -> List[str]:
         """模糊匹配特殊詞語檢測 - 處理重音、延遲等問題"""
+        return self._detect_fuzzy_normalized(NormalizedText.from_text(text))
+    
+    def _detect_fuzzy_normalized(self, normalized: NormalizedText) -> List[str]:
+        """模糊匹配特殊詞語檢測（已正規化文字）"""
         found_profanity = []
-        text_clean = re.sub(r'[^\w\s]', '', text.lower())  # 移除標點符號
+        text_clean = normalized.clean  # 已移除標點符號
         
-        print(f"      模糊檢測文字: 「{text_clean}」")
+        log.debug("模糊檢測文字: 「%s」", text_clean)
         
-        for profanity, patterns in self.profanity_patterns.items():
-            for pattern in patterns:
-                if re.search(pattern, text_clean):
+        scanner = self._current_fuzzy_scanner()
+        for pattern_id in scanner.scan([text_clean])[0]:
+            profanity, pattern = scanner.entries[pattern_id][:2]
+            if profanity not in found_profanity:  # 找到一個就跳到下個特殊詞語
+                found_profanity.append(profanity)
+                log.debug("🎯 模糊匹配到: %s (模式: %s)", profanity, pattern)
+        
+        return found_profanity
+    
+    def detect_profanity_fuzzy_batch(self, texts: List[str]) -> List[List[str]]:
+        """批次模糊匹配 - 一次掃描多個 ASR 片段"""
+        return self._detect_fuzzy_batch_normalized([NormalizedText.from_text(text) for text in texts])
+    
+    def _detect_fuzzy_batch_normalized(self, normalized_texts: List[NormalizedText]) -> List[List[str]]:
+        """批次模糊匹配（已正規化文字）"""
+        results = []
+        scanner = self._current_fuzzy_scanner()
+        for pattern_ids in scanner.scan([normalized.clean for normalized in normalized_texts]):
+            found_profanity = []
+            for pattern_id in pattern_ids:
+                profanity = scanner.entries[pattern_id][0]
+                if profanity not in found_profanity:
                     found_profanity.append(profanity)
-                    print(f"      🎯 模糊匹配到: {profanity} (模式: {pattern})")
-                    break  # 找到一個就跳到下個特殊詞語
+            results.append(found_profanity)
         
-        return 
+        return results
     
     def incremental_train_model(self, new_annotations: List[Dict]) -> Dict:
         """增量訓練自適應模型"""
@@ -154,8 +492,99 @@ class ProfanityDetector:
             print(f"自適應檢測失敗: {e}")
             return [], 0.0
     
-    def detect_profanity(self, text: str = "", audio_segment_path: str = "", use_fuzzy: bool = True) -> Dict:
-        """整合檢測方法"""
+    def _detect_text_matches_uncached(self, text_lower: str, use_fuzzy: bool) -> Tuple[tuple, tuple]:
+        """純文字檢測，返回 (基本檢測詞語, 模糊檢測詞語)；結果不可變以便快取"""
+        # 文字只正規化一次，供兩種文字檢測共用
+        normalized = NormalizedText(lower=text_lower, clean=text_lower.translate(PUNCTUATION_TABLE))
+        
+        # 方法1：基本文字檢測；方法2：模糊文字匹配
+        fuzzy_results = self._detect_fuzzy_normalized(normalized) if use_fuzzy else []
+        return tuple(self._detect_basic_normalized(normalized)), tuple(fuzzy_results)
+    
+    def _detect_profanity_text(self, text_lower: str, use_fuzzy: bool) -> Tuple[tuple, tuple, tuple]:
+        """純文字檢測，返回 (檢測詞語, 信心分數, 使用方法)"""
+        if use_fuzzy:
+            self._current_fuzzy_scanner()  # 模式被修改時先清除快取
+        return self._score_text_detections(*self._detect_text_matches(text_lower, use_fuzzy))
+    
+    def _score_text_detections(self, basic_results: List[str], fuzzy_results: List[str]) -> Tuple[tuple, tuple, tuple]:
+        """組合兩種文字檢測結果，返回 (檢測詞語, 信心分數, 使用方法)"""
+        detections = []
+        scores = []
+        methods = []
+        
+        if basic_results:
+            detections.extend(basic_results)
+            scores.append(0.8)
+            methods.append('basic_text')
+        
+        if fuzzy_results:
+            detections.extend(fuzzy_results)
+            scores.append(0.6)
+            methods.append('fuzzy_text')
+        
+        return tuple(detections), tuple(scores), tuple(methods)
+    
+    def detect_profanity(self, text: str = "", audio_segment_path: str = "", use_fuzzy: bool = True,
+                         early_exit: bool = False) -> Dict:
+        """整合檢測方法（early_exit 時找到第一個特殊詞語即返回，只適用於不需要完整詞語清單的整段消音）"""
+        if early_exit:
+            return self._detect_early_exit(text, audio_segment_path, use_fuzzy)
+        
+        # 方法1 + 方法2：文字檢測（依正規化文字快取）
+        text_result = self._detect_profanity_text(text.lower(), use_fuzzy) if text else ((), (), ())
+        return self._combine_detection(text_result, audio_segment_path)
+    
+    def _detect_early_exit(self, text: str, audio_segment_path: str = "", use_fuzzy: bool = True) -> Dict:
+        """找到第一個特殊詞語即返回；文字沒有命中時才進行自適應檢測"""
+        word = None
+        if text:
+            normalized = NormalizedText.from_text(text)
+            word = self._find_first_word(normalized.lower)
+            if word is None and use_fuzzy:
+                word = self._current_fuzzy_scanner().first_match(normalized.clean)
+        
+        if word is None:
+            return self._combine_detection(((), (), ()), audio_segment_path)
+        return {
+            'found_profanity': [word],
+            'confidence': 1.0,
+            'methods_used': ['early-exit'],
+            'adaptive_probability': 0.75
+        }
+    
+    def detect_profanity_batch(self, texts: List[str], audio_segment_paths: List[str] = None,
+                               use_fuzzy: bool = True, early_exit: bool = False) -> List[Dict]:
+        """批次整合檢測 - 所有片段的文字一次掃描，再逐段整合自適應檢測"""
+        if audio_segment_paths is None:
+            audio_segment_paths = [""] * len(texts)
+        
+        if early_exit:
+            return [self._detect_early_exit(text, audio_segment_path, use_fuzzy)
+                    for text, audio_segment_path in zip(texts, audio_segment_paths)]
+        
+        # 相同文字只檢測一次（ASR 常在相鄰片段輸出相同短句）
+        unique_texts = list(dict.fromkeys(text.lower() for text in texts if text))
+        normalized_texts = [NormalizedText(lower=text, clean=text.translate(PUNCTUATION_TABLE))
+                            for text in unique_texts]
+        
+        if use_fuzzy:
+            fuzzy_results = self._detect_fuzzy_batch_normalized(normalized_texts)
+        else:
+            fuzzy_results = [[] for _ in normalized_texts]
+        
+        text_results = {
+            text: self._score_text_detections(self._detect_basic_normalized(normalized), fuzzy)
+            for text, normalized, fuzzy in zip(unique_texts, normalized_texts, fuzzy_results)
+        }
+        
+        return [
+            self._combine_detection(text_results[text.lower()] if text else ((), (), ()), audio_segment_path)
+            for text, audio_segment_path in zip(texts, audio_segment_paths)
+        ]
+    
+    def _combine_detection(self, text_result: Tuple[tuple, tuple, tuple], audio_segment_path: str = "") -> Dict:
+        """整合文字檢測結果與自適應音頻檢測"""
         detection_results = {
             'found_profanity': [],
             'confidence': 0.0,
@@ -164,26 +593,20 @@ class ProfanityDetector:
         }
         
         all_detections = []
+        # 信心分數與權重同步累積，長度必定一致
         confidence_scores = []
+        weights = []
         
-        # 方法1：基本文字檢測
-        if text:
-            basic_results = self.detect_profanity_basic(text)
-            if basic_results:
-                all_detections.extend(basic_results)
-                confidence_scores.append(0.8)
-                detection_results['methods_used'].append('basic_text')
-        
-        # 方法2：模糊文字匹配
-        if text and use_fuzzy:
-            fuzzy_results = self.detect_profanity_fuzzy(text)
-            if fuzzy_results:
-                all_detections.extend(fuzzy_results)
-                confidence_scores.append(0.6)
-                detection_results['methods_used'].append('fuzzy_text')
-        
-        # 方法3：自適應音頻檢測
-        if audio_segment_path and os.path.exists(audio_segment_path):
+        # 方法1 + 方法2：文字檢測
+        text_detections, text_scores, text_methods = text_result
+        all_detections.extend(text_detections)
+        confidence_scores.extend(text_scores)
+        weights.extend([1 - self.adaptive_weight] * len(text_scores))
+        detection_results['methods_used'].extend(text_methods)
+        
+        # 方法3：自適應音頻檢測（文字檢測已高信心命中時略過模型推論）
+        text_is_confident = bool(all_detections) and max(confidence_scores) >= self.early_exit_threshold
+        if not text_is_confident and audio_segment_path and os.path.exists(audio_segment_path):
             adaptive_results, adaptive_prob = self.detect_profanity_adaptive(audio_segment_path)
             detection_results['adaptive_probability'] = adaptive_prob
             
@@ -194,6 +617,7 @@ class ProfanityDetector:
                 training_accuracy = self.adaptive_trainer.training_accuracy
                 adjusted_confidence = adaptive_prob * training_accuracy
                 confidence_scores.append(adjusted_confidence)
+                weights.append(self.adaptive_weight)
                 detection_results['methods_used'].append('adaptive_audio')
         
         # 整合結果
@@ -201,21 +625,12 @@ class ProfanityDetector:
             detection_results['found_profanity'] = list(set(all_detections))
             
             # 計算整體信心度
-            if confidence_scores:
-                # 使用加權平均，給自適應檢測更高權重
-                weights = []
-                for method in detection_results['methods_used']:
-                    if 'adaptive' in method:
-                        weights.append(self.adaptive_weight)
-                    else:
-                        weights.append(1 - self.adaptive_weight)
-                
-                if len(weights) == len(confidence_scores):
-                    detection_results['confidence'] = sum(w * c for w, c in zip(weights, confidence_scores)) / sum(weights)
-                else:
-                    detection_results['confidence'] = max(confidence_scores)
+            # 使用加權平均，給自適應檢測更高權重
+            w = np.asarray(weights, dtype=np.float64)
+            c = np.asarray(confidence_scores, dtype=np.float64)
+            detection_results['confidence'] = float(np.dot(w, c) / w.sum()) if w.size and w.sum() > 0 else 0.0
             
-            print(f"檢測結果: {detection_results}")
+            log.debug("檢測結果: %s", detection_results)
         
         return detection_results
     
@@ -269,8 +684,15 @@ class ProfanityDetector:
     # 保持向後兼容
     def add_custom_profanity(self, words: List[str]):
         """添加自定義特殊詞語詞庫"""
+        if self._trie_is_shared:
+            self._profanity_trie = copy.deepcopy(self._profanity_trie)
+            self._trie_is_shared = False
+        
         for word in words:
             self.profanity_words[word.lower()] = ["beep"]
+            _trie_insert(self._profanity_trie, word.lower())
+        self._automaton = None
+        self._detect_text_matches.cache_clear()
         print(f"已添加 {len(words)} 個自定義詞彙到過濾清單")
     
     def estimate_word_duration(self, word: str) -> float:
@@ -1,9 +1,32 @@
 # speech_recognition_engine.py - 語音辨識模組
+import io
 import os
+import re
+import shutil
+import asyncio
+import functools
+import logging
+import tempfile
+import threading
+import subprocess
+from bisect import bisect_right
+from collections import OrderedDict
+from pathlib import Path
+from types import MappingProxyType
+import numpy as np
+import scipy.signal
+from scipy.io import wavfile
 import speech_recognition as sr
+from concurrent.futures import ThreadPoolExecutor
 from pydub import AudioSegment
-from typing import List, Tuple
-from pydub.silence import detect_nonsilent
+from typing import List, Tuple, Dict, Union, BinaryIO, Optional
+
+# PyTorch (Whisper 與 NeMo 共用)
+try:
+    import torch
+    TORCH_AVAILABLE = True
+except ImportError:
+    TORCH_AVAILABLE = False
 
 # Whisper 
 try:
@@ -13,98 +36,324 @@ except ImportError:
     WHISPER_AVAILABLE = False
     print("Whisper 未安裝，使用 'pip install openai-whisper' 安裝")
 
+# faster-whisper (CTranslate2，本地整檔識別)
+try:
+    import ctranslate2
+    from faster_whisper import WhisperModel, decode_audio
+    FASTER_WHISPER_AVAILABLE = True
+except ImportError:
+    FASTER_WHISPER_AVAILABLE = False
+
+# faster-whisper 批次推論 (1.1 版以上)
+try:
+    from faster_whisper import BatchedInferencePipeline
+    BATCHED_WHISPER_AVAILABLE = True
+except ImportError:
+    BATCHED_WHISPER_AVAILABLE = False
+
+# NVIDIA NeMo Conformer-CTC (短片段識別，不需補零到 30 秒)
+try:
+    import nemo.collections.asr as nemo_asr
+    NEMO_AVAILABLE = True
+except ImportError:
+    NEMO_AVAILABLE = False
+
+# Numba (可選，用於加速重複片段偵測)
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+log = logging.getLogger(__name__)
+
+# Whisper 常在音樂、雜訊片段輸出的符號
+_SUSPICIOUS_CHARS = re.compile(r'[♪♫\[\]\(\)\*]')
+
+
+def _read_wav_float(audio_path: str) -> Tuple[int, np.ndarray]:
+    """讀取 WAV 為 [-1, 1] 範圍的 float32 陣列"""
+    sample_rate, samples = wavfile.read(audio_path)
+    if samples.dtype == np.uint8:
+        x = (samples.astype(np.float32) - 128.0) / 128.0
+    elif np.issubdtype(samples.dtype, np.integer):
+        x = samples.astype(np.float32) / float(np.iinfo(samples.dtype).max + 1)
+    else:
+        x = samples.astype(np.float32)
+    return sample_rate, x
+
+
+@functools.lru_cache(maxsize=32)
+def _bandpass_sos(low_hz: float, high_hz: float, sample_rate: int, order: int = 4) -> np.ndarray:
+    """帶通濾波器係數（依取樣率快取，各片段共用）"""
+    return scipy.signal.butter(order, [low_hz, high_hz], btype='band', fs=sample_rate, output='sos')
+
+
+def _write_wav_int16(audio_path: Union[str, BinaryIO], sample_rate: int, x: np.ndarray):
+    """將 float 陣列寫回 16-bit WAV（路徑或檔案物件）"""
+    wavfile.write(audio_path, sample_rate, (np.clip(x, -1.0, 1.0) * 32767).astype(np.int16))
+
+
+
+def _find_repeat(tokens) -> Tuple[int, int, int]:
+    """在詞語編號序列中尋找連續重複 3 次以上的片段，返回 (起點, 片段長度, 重複結束位置)；找不到時起點為 -1"""
+    n = len(tokens)
+    for pattern_len in range(2, n // 3 + 1):
+        for start in range(n - pattern_len * 2 + 1):
+            # 檢查是否有連續重複
+            repeats = 1
+            pos = start + pattern_len
+            
+            while pos + pattern_len <= n:
+                same = True
+                for k in range(pattern_len):
+                    if tokens[pos + k] != tokens[start + k]:
+                        same = False
+                        break
+                if not same:
+                    break
+                repeats += 1
+                pos += pattern_len
+            
+            if repeats >= 3:
+                return start, pattern_len, pos
+    return -1, 0, 0
+
+
+def _find_repeat_numpy(tokens: np.ndarray) -> Tuple[int, int, int]:
+    """_find_repeat 的向量化版本：每個片段長度只做一次整段陣列比較"""
+    n = tokens.size
+    for pattern_len in range(2, n // 3 + 1):
+        # same[i]：tokens[i:i+p] 與緊接的下一段 tokens[i+p:i+2p] 相同
+        matches = np.concatenate(([0], np.cumsum(tokens[pattern_len:] == tokens[:-pattern_len])))
+        same = (matches[pattern_len:] - matches[:-pattern_len]) == pattern_len
+        
+        # 連續出現 3 次：起點與下一段都與其後一段相同
+        hits = np.flatnonzero(same[:-pattern_len] & same[pattern_len:])
+        if hits.size:
+            start = int(hits[0])
+            pos = start + 3 * pattern_len
+            while pos + pattern_len <= n and same[pos - pattern_len]:
+                pos += pattern_len
+            return start, pattern_len, pos
+    return -1, 0, 0
+
+
+if NUMBA_AVAILABLE:
+    _find_repeat_native = njit(cache=True)(_find_repeat)
 
 
 class SpeechRecognitionEngine:
     """語音辨識引擎"""
     
+    # 語音辨識設定
+    _LANGUAGE_CODES = MappingProxyType({
+        'chinese': 'zh-TW',
+        'english': 'en-US',
+        'auto': None  # 自動檢測
+    })
+    # 對應到 Whisper "zh" 的語言名稱
+    _CHINESE_LANGUAGES = frozenset({'chinese', 'zh-TW', 'zh-CN', 'zh'})
+    
+    # 已載入的 Whisper 模型 {(大小, 是否 CTranslate2, 精度, 裝置): (模型, 是否 CTranslate2)}
+    # 同一行程內所有引擎共用；只保留最近使用的兩個（片段識別與整檔識別各一），其餘釋放
+    _whisper_models: OrderedDict = OrderedDict()
+    _whisper_models_lock = threading.Lock()
+    _WHISPER_MODELS_MAX = 2
+    
+    # 已載入的 Conformer 模型 {(模型名稱, 裝置): 模型}，只保留最近使用的一個
+    _conformer_models: OrderedDict = OrderedDict()
+    _CONFORMER_MODELS_MAX = 1
+    
+    # 非同步管線：CPU 密集的音頻增強與網路 I/O 的識別請求分開執行
+    # 同一行程內所有引擎共用，避免每建立一個引擎就多出一組不會關閉的執行緒
+    _cpu_pool = ThreadPoolExecutor(max_workers=os.cpu_count() or 2, thread_name_prefix='stt-cpu')
+    _io_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix='stt-io')
+    
+    # 多引擎識別時 Google 依序嘗試的語言
+    _LANGS_TRY = ('zh-TW', 'zh-CN', 'zh', 'en-US')
+    # Whisper 結果可疑時強制嘗試的中文設定
+    _WHISPER_RETRY_LANGS = ('zh', 'zh-cn', 'zh-tw')
+    
     def __init__(self):
         self.recognizer = sr.Recognizer()
         
-        # 語音辨識設定
-        self.language_codes = {
-            'chinese': 'zh-TW',
-            'english': 'en-US',
-            'auto': None  # 自動檢測
-        }
+        # 多重識別策略的等待上限（秒）
+        self.recognition_timeout = 30
+
+        # 激進音頻增強優先使用單次 FFmpeg 濾波（未安裝時使用 numpy 處理）
+        self.use_ffmpeg_enhancement = shutil.which('ffmpeg') is not None
+        
+        # 環境噪音閾值快取 (路徑+修改時間 -> energy_threshold)
+        self._energy_cache: Dict[str, float] = {}
+        self.ambient_noise_durations = (0.5, 1.0)  # 各策略需要的適應時間
+        self.global_energy_threshold = None  # 由完整音頻計算一次後套用到所有片段
+
+        # 批次識別設定 (Google Cloud 才提供逐字時間戳，用於拆回各片段)
+        self.google_cloud_credentials = None  # 服務帳戶 JSON 字串
+        self.batch_max_chunks = 8
+        self.batch_max_duration_ms = 55000   # 同步 API 單次上限約 60 秒
+        self.batch_silence_ms = 1000         # 片段間插入的靜音標記
 
         # Whisper 相關設定
         self.whisper_model = None
         self.use_whisper = False
+        self._whisper_lock = threading.Lock()  # 模型推論不可重入，多執行緒時逐一執行
+        self.prefer_ct2_whisper = True  # 已安裝 faster-whisper 時以 CTranslate2 執行（GPU FP16 / CPU INT8）
+        self._whisper_is_ct2 = False
+        self._batched_whisper = None  # 依 whisper_model 建立的批次推論管線
+        self.whisper_batch_size = 16  # 超過 16 容易耗盡 GPU 記憶體
+        self.whisper_sample_rate = 16000
+        self.use_torch_compile = True  # PyTorch Whisper 在 GPU 上以 torch.compile 編譯編碼器
+        self._copy_stream = None  # PyTorch Whisper 在 GPU 上時，波形複製使用的獨立 CUDA 串流
+        self._staging_buffer = None  # 重複使用的鎖頁記憶體緩衝區（不足時才加大）
+        self._staging_ready = None  # 上一次自緩衝區複製的完成事件
+        self._staging_lock = threading.Lock()
+        
+        # faster-whisper 整檔識別模型
+        self.faster_whisper_model = None
+        
+        # Conformer-CTC 模型（短片段使用）
+        self.conformer_model = None
+        self.use_conformer = False
+        self.conformer_model_name = "stt_zh_conformer_ctc_large"
+        self.conformer_batch_size = 16
+        self._conformer_lock = threading.Lock()
         
         if WHISPER_AVAILABLE:
             self.available_engines = ['google', 'whisper']
         else:
             self.available_engines = ['google']
+        if FASTER_WHISPER_AVAILABLE:
+            self.available_engines.append('faster-whisper')
+        if NEMO_AVAILABLE:
+            self.available_engines.append('nemo_conformer')
 
     
-    def enhance_audio_for_recognition(self, audio_path: str) -> str:
-        """增強音頻以提高識別率"""
+    def enhance_audio_for_recognition(self, audio_path: str) -> Union[str, io.BytesIO]:
+        """增強音頻以提高識別率 - 單次 numpy/scipy 處理，結果保留在記憶體"""
         try:
-            audio = AudioSegment.from_wav(audio_path)
+            sample_rate, x = _read_wav_float(audio_path)
             
             # 1. 音量正規化
             target_dBFS = -20
-            change_in_dBFS = target_dBFS - audio.dBFS
-            if change_in_dBFS < 30:  # 避免過度放大
-                audio = audio.apply_gain(change_in_dBFS)
+            rms = float(np.sqrt(np.mean(np.square(x)))) if x.size else 0.0
+            if rms > 0:
+                change_in_dBFS = target_dBFS - 20 * np.log10(rms)
+                if change_in_dBFS < 30:  # 避免過度放大
+                    x = x * np.float32(10 ** (change_in_dBFS / 20))
             
             # 2. 降噪處理
-            # 移除過低和過高頻率
-            audio = audio.high_pass_filter(300).low_pass_filter(3400)
+            # 移除過低和過高頻率 (300-3400 Hz 帶通)
+            high_cut = min(3400, 0.45 * sample_rate)
+            y = scipy.signal.sosfilt(_bandpass_sos(300, high_cut, sample_rate), x, axis=0)
             
-            # 3. 壓縮動態範圍
-            audio = audio.compress_dynamic_range()
+            # 3. 壓縮動態範圍 (閾值 -20 dBFS，比例 4:1)
+            threshold = 10 ** (-20 / 20)
+            ratio = 4.0
+            magnitude = np.abs(y)
+            y = np.sign(y) * (np.minimum(magnitude, threshold) +
+                              np.maximum(magnitude - threshold, 0) / ratio)
             
-            # 4. 保存增強後的音頻
-            enhanced_path = audio_path.replace('.wav', '_enhanced.wav')
-            audio.export(enhanced_path, format="wav")
+            # 4. 輸出到記憶體緩衝區 (sr.AudioFile 可直接讀取)
+            buffer = io.BytesIO()
+            _write_wav_int16(buffer, sample_rate, y)
+            buffer.seek(0)
             
-            return enhanced_path
+            return buffer
         except Exception as e:
-            print(f"音頻增強失敗: {e}")
+            log.warning("音頻增強失敗: %s", e)
             return audio_path
     
-    def speech_to_text_basic(self, audio_path: str, language: str = 'zh-TW') -> str:
-        """基本語音轉文字"""
+    def calibrate_ambient_noise(self, audio_path: str, duration: float = 1.0) -> Optional[float]:
+        """以完整音頻開頭計算一次環境噪音閾值，之後所有片段共用"""
         try:
+            recognizer = sr.Recognizer()
             with sr.AudioFile(audio_path) as source:
-                # 調整環境噪音
-                self.recognizer.adjust_for_ambient_noise(source, duration=0.5)
-                audio_data = self.recognizer.record(source)
+                recognizer.adjust_for_ambient_noise(source, duration=duration)
+            self.global_energy_threshold = recognizer.energy_threshold
+        except Exception as e:
+            print(f"環境噪音校正失敗: {e}")
+            self.global_energy_threshold = None
+        return self.global_energy_threshold
+    
+    def _get_recognizer_for(self, audio_path: Union[str, BinaryIO]) -> sr.Recognizer:
+        """取得已套用環境噪音閾值的 Recognizer - 每個檔案只計算一次"""
+        # 每次呼叫使用獨立的 Recognizer，避免並行策略互相覆蓋閾值
+        recognizer = sr.Recognizer()
+        
+        # 已由完整音頻校正過時，片段不再各自掃描環境噪音
+        if self.global_energy_threshold is not None:
+            recognizer.energy_threshold = self.global_energy_threshold
+            recognizer.dynamic_energy_threshold = False
+            return recognizer
+        
+        # 記憶體緩衝區沒有路徑可作快取鍵，直接計算後倒回開頭
+        if hasattr(audio_path, 'read'):
+            with sr.AudioFile(audio_path) as source:
+                recognizer.adjust_for_ambient_noise(source, duration=max(self.ambient_noise_durations))
+            audio_path.seek(0)
+            recognizer.dynamic_energy_threshold = False
+            return recognizer
+        
+        try:
+            cache_key = f"{audio_path}:{os.path.getmtime(audio_path)}"
+        except OSError:
+            cache_key = audio_path
+        
+        threshold = self._energy_cache.get(cache_key)
+        if threshold is None:
+            # 以最長的適應時間計算一次，供所有策略共用
+            with sr.AudioFile(audio_path) as source:
+                recognizer.adjust_for_ambient_noise(source, duration=max(self.ambient_noise_durations))
+            threshold = recognizer.energy_threshold
+            if len(self._energy_cache) > 1024:
+                self._energy_cache.clear()
+            self._energy_cache[cache_key] = threshold
+        
+        recognizer.energy_threshold = threshold
+        recognizer.dynamic_energy_threshold = False
+        return recognizer
+    
+    def speech_to_text_basic(self, audio_path: Union[str, BinaryIO], language: str = 'zh-TW') -> str:
+        """基本語音轉文字（接受路徑或 WAV 緩衝區）"""
+        try:
+            # 調整環境噪音（快取）
+            recognizer = self._get_recognizer_for(audio_path)
+            with sr.AudioFile(audio_path) as source:
+                audio_data = recognizer.record(source)
             
             # 選擇語言
-            lang_code = self.language_codes.get(language, 'zh-TW')
+            lang_code = SpeechRecognitionEngine._LANGUAGE_CODES.get(language, 'zh-TW')
             
             # 使用 Google 語音辨識
-            text = self.recognizer.recognize_google(audio_data, language=lang_code)
+            text = recognizer.recognize_google(audio_data, language=lang_code)
             return text.lower()
             
         except sr.UnknownValueError:
             # 無法識別語音
             return ""
         except sr.RequestError as e:
-            print(f"語音辨識服務錯誤: {e}")
+            log.warning("語音辨識服務錯誤: %s", e)
             return ""
         except Exception as e:
-            print(f"語音辨識失敗: {e}")
+            log.warning("語音辨識失敗: %s", e)
             return ""
     
     def speech_to_text_adjusted(self, audio_path: str, language: str = 'zh-TW') -> str:
         """調整參數的語音識別"""
         try:
+            # 更長的環境噪音適應時間（與基本識別共用快取）
+            recognizer = self._get_recognizer_for(audio_path)
             with sr.AudioFile(audio_path) as source:
-                # 更長的環境噪音適應時間
-                self.recognizer.adjust_for_ambient_noise(source, duration=1.0)
-                
                 # 調整能量閾值
-                self.recognizer.energy_threshold = 300
-                self.recognizer.dynamic_energy_threshold = True
+                recognizer.energy_threshold = 300
+                recognizer.dynamic_energy_threshold = True
                 
-                audio_data = self.recognizer.record(source)
+                audio_data = recognizer.record(source)
             
             # 嘗試不同的語音識別引擎設定
-            text = self.recognizer.recognize_google(
+            text = recognizer.recognize_google(
                 audio_data, 
                 language=language,
                 show_all=False  # 只要最佳結果
@@ -114,91 +363,270 @@ class SpeechRecognitionEngine:
         except Exception as e:
             return ""
     
-    def multi_recognition_strategy(self, audio_path: str, language: str = 'zh-TW') -> str:
-        """多重語音識別策略"""
+    async def speech_to_text_async(self, audio_path: Union[str, BinaryIO], language: str = 'zh-TW',
+                                   adjusted: bool = False) -> str:
+        """非同步語音轉文字 - 阻塞的識別請求交給 I/O 執行緒池"""
+        loop = asyncio.get_running_loop()
+        recognize = self.speech_to_text_adjusted if adjusted else self.speech_to_text_basic
+        return await loop.run_in_executor(self._io_pool, recognize, audio_path, language)
+    
+    async def _enhance_then_recognize_async(self, audio_path: str, language: str = 'zh-TW') -> str:
+        """增強音頻（CPU 池）後識別（I/O 池）；增強期間其他策略的請求持續進行"""
+        loop = asyncio.get_running_loop()
+        enhanced_audio = await loop.run_in_executor(self._cpu_pool, self.enhance_audio_for_recognition, audio_path)
+        return await self.speech_to_text_async(enhanced_audio, language)
+    
+    async def multi_recognition_strategy_async(self, audio_path: str, language: str = 'zh-TW',
+                                               _skip_enhancement: bool = False) -> str:
+        """多重語音識別策略（非同步）- 三種策略互不依賴，同時進行；呼叫端已增強過音頻時略過策略2"""
+        tasks = [asyncio.ensure_future(self.speech_to_text_async(audio_path, language))]                 # 策略1: 原始音頻識別
+        if not _skip_enhancement:
+            tasks.append(asyncio.ensure_future(self._enhance_then_recognize_async(audio_path, language)))  # 策略2: 增強音頻識別
+        tasks.append(asyncio.ensure_future(self.speech_to_text_async(audio_path, language, adjusted=True)))  # 策略3: 調整語音識別參數
+        
+        done, pending = await asyncio.wait(tasks, timeout=self.recognition_timeout)
+        if pending:
+            log.warning("部分識別策略超過 %s 秒，略過", self.recognition_timeout)
+            for task in pending:
+                task.cancel()
+        
+        # 依策略順序合併所有結果
         results = []
+        for task in tasks:
+            if task in done:
+                if task.exception() is not None:
+                    log.warning("識別策略失敗: %s", task.exception())
+                elif task.result():
+                    results.append(task.result())
+        
+        combined_text = " ".join(results)
+        log.debug("多重識別結果: %s", results)
         
+        return combined_text
+    
+    def multi_recognition_strategy(self, audio_path: str, language: str = 'zh-TW',
+                                   _skip_enhancement: bool = False) -> str:
+        """多重語音識別策略 - 同步入口，以 asyncio.run 執行非同步管線"""
         try:
-            # 策略1: 原始音頻識別
-            original_text = self.speech_to_text_basic(audio_path, language)
-            if original_text:
-                results.append(original_text)
-            
-            # 策略2: 增強音頻識別
-            enhanced_path = self.enhance_audio_for_recognition(audio_path)
-            enhanced_text = self.speech_to_text_basic(enhanced_path, language)
-            if enhanced_text:
-                results.append(enhanced_text)
-            
-            # 策略3: 調整語音識別參數
-            adjusted_text = self.speech_to_text_adjusted(audio_path, language)
-            if adjusted_text:
-                results.append(adjusted_text)
-            
-            # 清理臨時文件
             try:
-                if enhanced_path != audio_path:
-                    os.remove(enhanced_path)
-            except:
-                pass
+                asyncio.get_running_loop()
+            except RuntimeError:
+                return asyncio.run(self.multi_recognition_strategy_async(audio_path, language, _skip_enhancement))
             
-            # 合併所有結果
-            combined_text = " ".join(results)
-            print(f"      多重識別結果: {results}")
-            
-            return combined_text
+            # 已在事件迴圈中（例如被其他協程呼叫），改在獨立執行緒中執行
+            with ThreadPoolExecutor(max_workers=1) as runner:
+                return runner.submit(asyncio.run, self.multi_recognition_strategy_async(audio_path, language, _skip_enhancement)).result()
         
         except Exception as e:
-            print(f"多重識別失敗: {e}")
+            log.warning("多重識別失敗: %s", e)
             return ""
     
+    def can_batch_whisper(self) -> bool:
+        """目前的 Whisper 模型是否支援多片段批次推論"""
+        return BATCHED_WHISPER_AVAILABLE and self.use_whisper and self._whisper_is_ct2
+    
+    def speech_to_text_batch(self, chunk_paths: List[str], language: str = 'chinese',
+                             prefer_whisper: bool = False) -> List[str]:
+        """批次語音識別 - 將多個短片段以靜音隔開合併為一次請求，再依時間戳拆回"""
+        if prefer_whisper and self.can_batch_whisper():
+            return self.speech_to_text_whisper_batch(chunk_paths, language)
+        
+        lang_code = SpeechRecognitionEngine._LANGUAGE_CODES.get(language, 'zh-TW')
+        
+        if not self.google_cloud_credentials:
+            # 免費端點沒有逐字時間戳，無法拆分合併結果，逐段識別
+            return [self.speech_to_text_basic(path, lang_code) for path in chunk_paths]
+        
+        texts = [""] * len(chunk_paths)
+        
+        # 依片段數與總時長分組
+        groups = []
+        current, current_ms = [], 0
+        for index, path in enumerate(chunk_paths):
+            try:
+                segment = AudioSegment.from_wav(path).set_channels(1)
+            except Exception as e:
+                log.warning("讀取片段失敗 %s: %s", path, e)
+                continue
+            
+            segment_ms = len(segment) + self.batch_silence_ms
+            if current and (len(current) >= self.batch_max_chunks or
+                            current_ms + segment_ms > self.batch_max_duration_ms):
+                groups.append(current)
+                current, current_ms = [], 0
+            current.append((index, segment))
+            current_ms += segment_ms
+        if current:
+            groups.append(current)
+        
+        for group in groups:
+            # 合併音頻並記錄每個片段的起始時間
+            combined = AudioSegment.empty()
+            starts = []
+            for _, segment in group:
+                starts.append(len(combined) / 1000.0)
+                combined += segment + AudioSegment.silent(duration=self.batch_silence_ms,
+                                                          frame_rate=segment.frame_rate)
+            
+            audio_data = sr.AudioData(combined.raw_data, combined.frame_rate, combined.sample_width)
+            try:
+                response = self.recognizer.recognize_google_cloud(
+                    audio_data,
+                    credentials_json=self.google_cloud_credentials,
+                    language=lang_code,
+                    show_all=True  # 包含逐字時間戳
+                )
+            except Exception as e:
+                log.warning("批次識別失敗，改為逐段識別: %s", e)
+                for index, _ in group:
+                    texts[index] = self.speech_to_text_basic(chunk_paths[index], lang_code)
+                continue
+            
+            # 依每個詞的開始時間分配回原片段
+            words_by_chunk = [[] for _ in group]
+            for result in (response or {}).get('results', []):
+                alternatives = result.get('alternatives') or [{}]
+                for word_info in alternatives[0].get('words', []):
+                    start_time = float(str(word_info.get('startTime', '0s')).rstrip('s') or 0)
+                    slot = max(bisect_right(starts, start_time) - 1, 0)
+                    words_by_chunk[slot].append(word_info.get('word', ''))
+            
+            separator = "" if lang_code and lang_code.startswith('zh') else " "
+            for (index, _), words in zip(group, words_by_chunk):
+                texts[index] = separator.join(words).lower()
+        
+        log.info("      批次識別完成: %d/%d 個片段有結果", sum(1 for t in texts if t), len(texts))
+        return texts
+    
+    def speech_to_text_whisper_batch(self, chunk_paths: List[Union[str, np.ndarray]], language: str = 'chinese',
+                                     sample_rate: int = None) -> List[str]:
+        """Whisper 批次識別 - 片段依時長排序後串接，以 clip_timestamps 標出範圍一次批次解碼（可傳入路徑或波形）"""
+        texts = [""] * len(chunk_paths)
+        whisper_lang = "zh" if language in self._CHINESE_LANGUAGES else "en"
+        max_samples = 30 * self.whisper_sample_rate  # Whisper 單一視窗上限
+        
+        # 解碼所有片段（編碼器輸入固定為 30 秒視窗，分組不會減少補零，故一次送出）
+        members = []
+        owners = set()
+        batch_done = False
+        for index, path in enumerate(chunk_paths):
+            try:
+                if isinstance(path, str):
+                    audio = decode_audio(path, sampling_rate=self.whisper_sample_rate)
+                else:
+                    audio = self._to_whisper_audio(path, sample_rate or self.whisper_sample_rate)
+            except Exception as e:
+                log.warning("讀取片段 %d 失敗: %s", index + 1, e)
+                continue
+            if audio.size == 0 or audio.size > max_samples:
+                continue  # 超過單一視窗的片段改為逐段識別
+            members.append((index, audio))
+            owners.add(index)
+        
+        if owners:
+            if self._batched_whisper is None or self._batched_whisper.model is not self.whisper_model:
+                self._batched_whisper = BatchedInferencePipeline(model=self.whisper_model)
+            
+            # 時長相近的片段排在一起，同一批次內的解碼步數較一致
+            members.sort(key=lambda member: member[1].size)
+            try:
+                batch_texts = self._transcribe_whisper_clips([audio for _, audio in members], whisper_lang)
+                for (index, _), text in zip(members, batch_texts):
+                    texts[index] = self.clean_whisper_result(text)
+                batch_done = True
+            except Exception as e:
+                log.warning("Whisper 批次識別失敗，改為逐段識別: %s", e)
+            
+            if batch_done and not any(texts[index] for index in owners):
+                # 舊版 faster-whisper 對 clip_timestamps 的解讀不同時，所有片段都會沒有結果
+                log.warning("Whisper 批次識別沒有任何片段有結果，全部改為逐段識別"
+                            "（請確認 faster-whisper >= 1.1.0）")
+                batch_done = False  # 視同批次失敗，逐段仍先以 Whisper 識別
+        
+        # 沒有結果的片段逐段補識別（與單段流程相同：Whisper 無結果時改用 Google）
+        for index, path in enumerate(chunk_paths):
+            if not texts[index]:
+                whisper_tried = batch_done and index in owners
+                texts[index] = self.speech_to_text(path, language, prefer_whisper=not whisper_tried,
+                                                   sample_rate=sample_rate)
+        
+        log.info("      Whisper 批次識別完成: %d/%d 個片段有結果", sum(1 for t in texts if t), len(texts))
+        return texts
+    
+    def _transcribe_whisper_clips(self, audios: List[np.ndarray], language: str) -> List[str]:
+        """串接片段並以 clip_timestamps 標出範圍，一次批次解碼"""
+        clips = []
+        offset = 0
+        for audio in audios:
+            clips.append({'start': offset / self.whisper_sample_rate,
+                          'end': (offset + audio.size) / self.whisper_sample_rate})
+            offset += audio.size
+        
+        clip_starts = [clip['start'] for clip in clips]
+        pieces = [[] for _ in audios]
+        with self._whisper_lock:
+            segments, info = self._batched_whisper.transcribe(
+                np.concatenate(audios),
+                language=language,
+                batch_size=self.whisper_batch_size,
+                clip_timestamps=clips,
+                without_timestamps=True,
+            )
+            # 依段落開始時間分配回原片段
+            for segment in segments:
+                slot = max(bisect_right(clip_starts, segment.start) - 1, 0)
+                pieces[slot].append(segment.text)
+        
+        return ["".join(piece).strip() for piece in pieces]
+    
     def multi_engine_recognition(self, audio_path: str) -> str:
         """使用多個語音引擎識別"""
-        results = []
+        # 音頻只讀取一次，各引擎共用同一份 AudioData
+        try:
+            with sr.AudioFile(audio_path) as source:
+                audio_data = self.recognizer.record(source)
+        except Exception as e:
+            log.warning("      讀取音頻失敗: %s", e)
+            return ""
+        
+        # 引擎1: Google (多語言嘗試，網路請求並行)
+        google_futures = [
+            (lang, self._io_pool.submit(self.recognizer.recognize_google, audio_data, language=lang))
+            for lang in self._LANGS_TRY
+        ]
+        # 引擎2: Sphinx (離線，對中文支援較差但可以嘗試)
+        sphinx_future = self._cpu_pool.submit(self.recognizer.recognize_sphinx, audio_data)
+        # 引擎3: Google的詳細結果
+        alt_future = self._io_pool.submit(self.recognizer.recognize_google, audio_data,
+                                          language='zh-TW', show_all=True)
         
-        # 引擎1: Google (多語言嘗試)
-        languages = ['zh-TW', 'zh-CN', 'zh', 'en-US']
-        for lang in languages:
+        results = []
+        for lang, future in google_futures:
             try:
-                with sr.AudioFile(audio_path) as source:
-                    self.recognizer.adjust_for_ambient_noise(source, duration=0.5)
-                    audio_data = self.recognizer.record(source)
-                
-                text = self.recognizer.recognize_google(audio_data, language=lang)
+                text = future.result()
                 if text and len(text) > 2:
                     results.append(f"[Google-{lang}] {text}")
-                    print(f"      Google-{lang}: {text}")
+                    log.info("      Google-%s: %s", lang, text)
             except:
                 continue
         
-        # 引擎2: Sphinx (離線，對中文支援較差但可以嘗試)
         try:
-            with sr.AudioFile(audio_path) as source:
-                audio_data = self.recognizer.record(source)
-            text = self.recognizer.recognize_sphinx(audio_data)
+            text = sphinx_future.result()
             if text:
                 results.append(f"[Sphinx] {text}")
-                print(f"      Sphinx: {text}")
+                log.info("      Sphinx: %s", text)
         except:
             pass
         
-        # 引擎3: Google的詳細結果
         try:
-            with sr.AudioFile(audio_path) as source:
-                audio_data = self.recognizer.record(source)
-            
             # 獲取詳細結果
-            response = self.recognizer.recognize_google(
-                audio_data, 
-                language='zh-TW', 
-                show_all=True
-            )
+            response = alt_future.result()
             
             if response and 'alternative' in response:
                 for alt in response['alternative'][:3]:  # 取前3個結果
                     if 'transcript' in alt:
                         results.append(f"[Google-Alt] {alt['transcript']}")
-                        print(f"      Google替代: {alt['transcript']}")
+                        log.info("      Google替代: %s", alt['transcript'])
         except:
             pass
         
@@ -210,55 +638,104 @@ class SpeechRecognitionEngine:
         return ""
 
     def aggressive_audio_enhancement(self, audio_path: str) -> str:
-        """激進的音頻增強"""
+        """激進的音頻增強 - FFmpeg 單次串流完成濾波、正規化、去靜音與重取樣"""
+        enhanced_path = audio_path.replace('.wav', '_super_enhanced.wav')
+        
+        if self.use_ffmpeg_enhancement:
+            cmd = [
+                'ffmpeg', '-loglevel', 'error',
+                '-i', audio_path,
+                '-vn', '-ac', '1', '-ar', '16000',  # 16kHz 單聲道
+                '-af', ('highpass=f=200,lowpass=f=8000,'           # 保留語音頻率
+                        'dynaudnorm=f=150:g=15,'                   # 動態音量正規化
+                        'silenceremove=stop_periods=-1:stop_duration=0.2:stop_threshold=-40dB'),  # 去除靜音
+                '-y', enhanced_path
+            ]
+            try:
+                result = subprocess.run(cmd, capture_output=True, text=True,
+                                        encoding='utf-8', errors='ignore')
+                if result.returncode == 0:
+                    return enhanced_path
+                log.warning("FFmpeg 音頻增強失敗: %s，改用 numpy 處理", result.stderr.strip())
+            except Exception as e:
+                log.warning("FFmpeg 音頻增強失敗: %s，改用 numpy 處理", e)
+        
+        return self._aggressive_enhancement_numpy(audio_path, enhanced_path)
+    
+    def _aggressive_enhancement_numpy(self, audio_path: str, enhanced_path: str) -> str:
+        """激進的音頻增強 - 單次讀取後以 numpy/scipy 完成整條處理鏈"""
         try:
-            audio = AudioSegment.from_wav(audio_path)
+            sample_rate, x = _read_wav_float(audio_path)
             
             # 1. 強化音量
-            if audio.dBFS < -30:
-                audio = audio + (20 - audio.dBFS)  # 大幅提升音量
+            rms = float(np.sqrt(np.mean(np.square(x)))) if x.size else 0.0
+            if 0 < rms and 20 * np.log10(rms) < -30:
+                x = np.clip(x * np.float32(10 ** ((20 - 20 * np.log10(rms)) / 20)), -1.0, 1.0)  # 大幅提升音量
             
             # 2. 減少背景噪音
-            # 使用更激進的濾波
-            audio = audio.high_pass_filter(200)  # 移除低頻噪音
-            audio = audio.low_pass_filter(8000)  # 保留語音頻率
+            # 使用更激進的濾波：移除 200 Hz 以下低頻噪音，保留 8 kHz 以下語音頻率
+            high_cut = min(8000, 0.45 * sample_rate)
+            y = scipy.signal.sosfilt(_bandpass_sos(200, high_cut, sample_rate), x, axis=0).astype(np.float32)
             
-            # 3. 壓縮和正規化
-            audio = audio.compress_dynamic_range(threshold=-25.0, ratio=6.0)
-            audio = audio.normalize()
+            # 3. 壓縮 (閾值 -25 dBFS，比例 6:1) 和正規化 (峰值 -0.1 dBFS)
+            threshold = 10 ** (-25 / 20)
+            magnitude = np.abs(y)
+            y = np.sign(y) * (np.minimum(magnitude, threshold) +
+                              np.maximum(magnitude - threshold, 0) / 6.0)
+            peak = float(np.max(np.abs(y))) if y.size else 0.0
+            if peak > 0:
+                y *= np.float32(10 ** (-0.1 / 20) / peak)
             
-            # 4. 去除靜音片段
-            from pydub.silence import detect_nonsilent
-            nonsilent_ranges = detect_nonsilent(
-                audio, 
-                min_silence_len=200,  # 最小靜音長度
-                silence_thresh=audio.dBFS - 20
-            )
+            # 4. 去除靜音片段 (200ms 視窗、每 1ms 移動，低於整體音量 20 dB 視為靜音)
+            y = self._remove_silence(y, sample_rate, min_silence_ms=200, relative_thresh_db=-20)
             
-            if nonsilent_ranges:
-                # 只保留有聲音的部分
-                combined = AudioSegment.empty()
-                for start_ms, end_ms in nonsilent_ranges:
-                    combined += audio[start_ms:end_ms]
-                audio = combined
-            
-            # 5. 保存
-            enhanced_path = audio_path.replace('.wav', '_super_enhanced.wav')
-            audio.export(enhanced_path, format="wav", parameters=["-ar", "16000"])  # 16kHz採樣率
+            # 5. 保存為 16kHz
+            if sample_rate != 16000:
+                y = scipy.signal.resample_poly(y, 16000, sample_rate, axis=0)
+                sample_rate = 16000
+            _write_wav_int16(enhanced_path, sample_rate, y)
             
             return enhanced_path
             
         except Exception as e:
-            print(f"激進音頻增強失敗: {e}")
+            log.warning("激進音頻增強失敗: %s", e)
             return audio_path
-
+    
+    def _remove_silence(self, y: np.ndarray, sample_rate: int, min_silence_ms: int = 200,
+                        relative_thresh_db: float = -20) -> np.ndarray:
+        """移除靜音片段，只保留有聲音的部分（全部為靜音時返回原音頻）"""
+        power = np.square(y, dtype=np.float64)
+        if power.ndim > 1:
+            power = power.mean(axis=1)
+        
+        window = int(sample_rate * min_silence_ms / 1000)
+        step = max(1, sample_rate // 1000)
+        if window <= 0 or power.size < window:
+            return y
+        
+        # 以累積和計算每個視窗的均方值
+        cumulative = np.concatenate(([0.0], np.cumsum(power)))
+        starts = np.arange(0, power.size - window + 1, step)
+        window_power = (cumulative[starts + window] - cumulative[starts]) / window
+        silence_power = power.mean() * 10 ** (relative_thresh_db / 10)
+        silent_starts = starts[window_power < silence_power]
+        
+        if silent_starts.size == 0:
+            return y
+        
+        # 靜音視窗覆蓋的樣本標記為靜音
+        coverage = np.zeros(power.size + 1, dtype=np.int32)
+        np.add.at(coverage, silent_starts, 1)
+        np.add.at(coverage, silent_starts + window, -1)
+        voiced = np.cumsum(coverage[:-1]) == 0
+        
+        if not voiced.any():
+            return y
+        return y[voiced]
+    
     ### Whisper
     def clear_whisper_cache(self):
         """清理損壞的 Whisper 模型快取"""
-        import os
-        import shutil
-        from pathlib import Path
-        
         cache_dir = Path.home() / ".cache" / "whisper"
         
         if cache_dir.exists():
@@ -273,25 +750,74 @@ class SpeechRecognitionEngine:
             print("快取目錄不存在")
             return True
         
-    def load_whisper_model(self, model_size: str = "base"):
-        """載入 Whisper 模型 - 避免重複載入"""
-        if not WHISPER_AVAILABLE:
+    def load_whisper_model(self, model_size: str = "base", compute_type: str = None, device: str = None):
+        """載入 Whisper 模型 - 避免重複載入（device 為 "auto" 或 None 時自動選擇）"""
+        use_ct2 = FASTER_WHISPER_AVAILABLE and self.prefer_ct2_whisper
+        if not WHISPER_AVAILABLE and not use_ct2:
             return False
+        if device == "auto":
+            device = None
+        if use_ct2:
+            device, compute_type = self._ct2_device_and_compute_type(device, compute_type)
+        model_key = (model_size, use_ct2, compute_type if use_ct2 else None, device)
      
         # 檢查是否已經載入相同模型
         if (self.whisper_model is not None and 
-            hasattr(self, 'current_model_size') and 
-            self.current_model_size == model_size):
+            getattr(self, 'whisper_model_key', None) == model_key):
             print(f"Whisper {model_size} 模型已載入，跳過")
             return True
         
+        # 同一行程內的引擎共用已載入的模型；同時載入時等待第一個完成
+        with SpeechRecognitionEngine._whisper_models_lock:
+            cached = SpeechRecognitionEngine._whisper_models.get(model_key)
+            if cached is None:
+                cached = self._load_whisper_backend(model_size, use_ct2, compute_type, device)
+                if cached is None:
+                    return False
+                self._cache_model(SpeechRecognitionEngine._whisper_models, model_key, cached,
+                                  self._WHISPER_MODELS_MAX)
+            else:
+                SpeechRecognitionEngine._whisper_models.move_to_end(model_key)
+                print(f"使用已載入的 Whisper {model_size} 模型")
+        
+        self.whisper_model, self._whisper_is_ct2 = cached
+        self.current_model_size = model_size
+        self.whisper_model_key = model_key
+        self.use_whisper = True
+        return True
+    
+    @staticmethod
+    def _cache_model(cache: OrderedDict, key: tuple, model, max_size: int):
+        """記錄已載入的模型，超過上限時移除最久未使用的（呼叫端需持有 _whisper_models_lock）"""
+        cache[key] = model
+        cache.move_to_end(key)
+        while len(cache) > max_size:
+            evicted_key, _ = cache.popitem(last=False)
+            print(f"已釋放模型快取: {evicted_key[0]}")
+    
+    def _load_whisper_backend(self, model_size: str, use_ct2: bool, compute_type: Optional[str],
+                              device: Optional[str]) -> Optional[Tuple[object, bool]]:
+        """實際載入模型，返回 (模型, 是否為 CTranslate2)；失敗時返回 None"""
+        if use_ct2:
+            try:
+                print(f"正在載入 Whisper {model_size} 模型 (faster-whisper, {device}, {compute_type})...")
+                model = WhisperModel(model_size, device=device, compute_type=compute_type,
+                                     cpu_threads=self._ct2_cpu_threads(device))
+                print("Whisper 模型載入成功")
+                return model, True
+            except Exception as e:
+                print(f"faster-whisper 模型載入失敗: {e}")
+                if not WHISPER_AVAILABLE:
+                    return None
+                device = None  # CTranslate2 的裝置名稱不一定適用於 PyTorch
+        
         try:
+            if not FASTER_WHISPER_AVAILABLE:
+                print("提示: 安裝 faster-whisper 可使用 INT8/FP16 模型，降低記憶體用量")
             print(f"正在載入 Whisper {model_size} 模型...")
-            self.whisper_model = whisper.load_model(model_size)
-            self.current_model_size = model_size
-            self.use_whisper = True
+            model = self._compile_whisper(whisper.load_model(model_size, device=device))
             print("Whisper 模型載入成功")
-            return True
+            return model, False
         
         except Exception as e:
             # 錯誤處理邏輯...
@@ -302,51 +828,301 @@ class SpeechRecognitionEngine:
                 if self.clear_whisper_cache():
                     try:
                         print(f"重新載入 Whisper {model_size} 模型...")
-                        self.whisper_model = whisper.load_model(model_size)
-                        self.use_whisper = True
+                        model = self._compile_whisper(whisper.load_model(model_size, device=device))
                         print("重新載入成功")
-                        return True
+                        return model, False
                     except Exception as e2:
                         print(f"重新載入也失敗: {e2}")
+        return None
     
-    def speech_to_text_whisper(self, audio_path: str, language: str = "zh") -> str:
-        """使用 Whisper 進行語音識別 - 改善語言檢測"""
-        if not self.use_whisper or not self.whisper_model:
-            return ""
+    def prewarm(self, model_size: str = "base", compute_type: str = None, device: str = None) -> threading.Thread:
+        """背景載入 Whisper 模型並以一秒靜音暖機，第一次識別不必等待載入"""
+        def warm():
+            if self.load_whisper_model(model_size, compute_type, device):
+                try:
+                    self._whisper_transcribe(np.zeros(self.whisper_sample_rate, dtype=np.float32), "zh")
+                except Exception as e:
+                    log.debug("Whisper 暖機失敗: %s", e)
         
+        thread = threading.Thread(target=warm, daemon=True)
+        thread.start()
+        return thread
+    
+    def _compile_whisper(self, model):
+        """GPU 上以 torch.compile 編譯編碼器（輸入固定為 30 秒梅爾頻譜），並先暖機一次"""
+        if not self.use_torch_compile or model.device.type != 'cuda' or not hasattr(torch, 'compile'):
+            return model
+        
+        encoder = model.encoder
         try:
-            # 第一次嘗試：自動檢測，但提供語言提示
+            model.encoder = torch.compile(encoder, mode="reduce-overhead")
+            with torch.no_grad():
+                mel = torch.zeros(1, model.dims.n_mels, 3000, device=model.device, dtype=torch.float16)
+                model.encoder(mel)
+            print("Whisper 編碼器已以 torch.compile 編譯")
+        except Exception as e:
+            print(f"torch.compile 失敗，使用未編譯模型: {e}")
+            model.encoder = encoder
+        return model
+    
+    def _ct2_device_and_compute_type(self, device: str = None, compute_type: str = None) -> Tuple[str, str]:
+        """CTranslate2 執行裝置與精度：有 GPU 時使用 FP16，否則 CPU INT8"""
+        if device is None or device == "auto":
+            device = "cuda" if ctranslate2.get_cuda_device_count() > 0 else "cpu"
+        if compute_type is None:
+            compute_type = "float16" if device == "cuda" else "int8"
+        elif compute_type == "int8" and device == "cuda":
+            compute_type = "int8_float16"  # GPU 上 INT8 權重搭配 FP16 運算
+        return device, compute_type
+    
+    def _ct2_cpu_threads(self, device: str) -> int:
+        """CPU 推論使用全部核心（0 為 CTranslate2 預設值）"""
+        return (os.cpu_count() or 0) if device == "cpu" else 0
+    
+    def load_faster_whisper_model(self, model_size: str = "large-v3", device: str = None,
+                                  compute_type: str = None) -> bool:
+        """載入 faster-whisper 模型 - GPU 使用 FP16，CPU 使用 INT8"""
+        if not FASTER_WHISPER_AVAILABLE:
+            print("faster-whisper 未安裝，使用 'pip install faster-whisper' 安裝")
+            return False
+        
+        device, compute_type = self._ct2_device_and_compute_type(device, compute_type)
+        
+        # 與片段識別模型共用快取（相同大小與精度時只載入一次）
+        model_key = (model_size, True, compute_type, device)
+        if self.faster_whisper_model is not None and getattr(self, 'faster_whisper_key', None) == model_key:
+            return True
+        
+        with SpeechRecognitionEngine._whisper_models_lock:
+            cached = SpeechRecognitionEngine._whisper_models.get(model_key)
+            if cached is None or not cached[1]:
+                try:
+                    print(f"正在載入 faster-whisper {model_size} 模型 ({device}, {compute_type})...")
+                    cached = (WhisperModel(model_size, device=device, compute_type=compute_type,
+                                           cpu_threads=self._ct2_cpu_threads(device)), True)
+                    print("faster-whisper 模型載入成功")
+                except Exception as e:
+                    print(f"faster-whisper 模型載入失敗: {e}")
+                    self.faster_whisper_model = None
+                    return False
+                self._cache_model(SpeechRecognitionEngine._whisper_models, model_key, cached,
+                                  self._WHISPER_MODELS_MAX)
+            else:
+                SpeechRecognitionEngine._whisper_models.move_to_end(model_key)
+        
+        self.faster_whisper_model = cached[0]
+        self.faster_whisper_key = model_key
+        return True
+    
+    def load_conformer_model(self, model_name: str = None, device: str = None) -> bool:
+        """載入 NeMo Conformer-CTC 模型 - 短片段不需補零到 30 秒，識別速度快很多"""
+        if not NEMO_AVAILABLE:
+            print("NeMo 未安裝，使用 'pip install nemo_toolkit[asr]' 安裝")
+            return False
+        
+        model_name = model_name or self.conformer_model_name
+        if device is None or device == "auto":
+            device = "cuda" if torch.cuda.is_available() else "cpu"
+        model_key = (model_name, device)
+        if self.conformer_model is not None and getattr(self, 'conformer_model_key', None) == model_key:
+            return True
+        
+        with SpeechRecognitionEngine._whisper_models_lock:
+            model = SpeechRecognitionEngine._conformer_models.get(model_key)
+            if model is None:
+                try:
+                    print(f"正在載入 Conformer 模型 {model_name} ({device})...")
+                    model = nemo_asr.models.EncDecCTCModelBPE.from_pretrained(
+                        model_name, map_location=torch.device(device))
+                    model.eval()
+                    print("Conformer 模型載入成功")
+                except Exception as e:
+                    print(f"Conformer 模型載入失敗: {e}")
+                    return False
+                self._cache_model(SpeechRecognitionEngine._conformer_models, model_key, model,
+                                  self._CONFORMER_MODELS_MAX)
+            else:
+                SpeechRecognitionEngine._conformer_models.move_to_end(model_key)
+        
+        self.conformer_model = model
+        self.conformer_model_name = model_name
+        self.conformer_model_key = model_key
+        self.use_conformer = True
+        return True
+    
+    def speech_to_text_conformer_batch(self, chunks: List[Union[str, np.ndarray]],
+                                       sample_rate: int = None) -> List[str]:
+        """Conformer-CTC 批次識別（可傳入路徑或波形），失敗的片段返回空字串"""
+        if not self.use_conformer or not chunks:
+            return [""] * len(chunks)
+        
+        try:
+            audios = [
+                self._load_whisper_audio(chunk) if isinstance(chunk, str)
+                else self._to_whisper_audio(chunk, sample_rate or self.whisper_sample_rate)
+                for chunk in chunks
+            ]
+            with self._conformer_lock, torch.inference_mode():
+                hypotheses = self.conformer_model.transcribe(audios, batch_size=self.conformer_batch_size,
+                                                             verbose=False)
+        except Exception as e:
+            log.warning("      Conformer 識別失敗: %s", e)
+            return [""] * len(chunks)
+        
+        if isinstance(hypotheses, tuple):  # 部分版本返回 (best, all)
+            hypotheses = hypotheses[0]
+        # 新版返回 Hypothesis 物件，舊版返回字串
+        return [getattr(hypothesis, 'text', hypothesis).strip() for hypothesis in hypotheses]
+    
+    def speech_to_text_conformer(self, audio: Union[str, np.ndarray], sample_rate: int = None) -> str:
+        """使用 Conformer-CTC 識別單一片段"""
+        text = self.speech_to_text_conformer_batch([audio], sample_rate)[0]
+        if text:
+            log.info("      Conformer 結果: %s", text)
+        return text
+    
+    def transcribe_full(self, audio_path: str, language: str = 'chinese') -> List[Dict]:
+        """整檔識別 - 一次處理完整音頻，返回含逐字時間戳的段落"""
+        if self.faster_whisper_model is None:
+            return []
+        
+        if language == 'auto':
+            whisper_lang = None
+        else:
+            whisper_lang = "zh" if language in self._CHINESE_LANGUAGES else "en"
+        
+        segments, info = self.faster_whisper_model.transcribe(
+            audio_path,
+            language=whisper_lang,
+            word_timestamps=True,
+            vad_filter=True,  # 內建 VAD 取代片段切割
+        )
+        
+        results = []
+        for segment in segments:
+            results.append({
+                'start': segment.start,
+                'end': segment.end,
+                'text': segment.text.strip(),
+                'words': [
+                    {'word': word.word.strip(), 'start': word.start, 'end': word.end}
+                    for word in (segment.words or [])
+                ]
+            })
+        
+        print(f"   整檔識別完成，共 {len(results)} 個段落 (語言: {info.language})")
+        return results
+    
+    def _stage_whisper_audio(self, audio: np.ndarray) -> Tuple[object, Optional[object]]:
+        """PyTorch Whisper 在 GPU 上時，波形經共用的鎖頁緩衝區以獨立串流非同步複製到 GPU，返回 (張量, 完成事件)
+
+        在取得推論鎖之前呼叫，複製可與其他片段的解碼重疊；梅爾頻譜也直接在 GPU 上計算。
+        其他情況原樣返回 (audio, None)。
+        """
+        if self._whisper_is_ct2 or self.whisper_model is None or self.whisper_model.device.type != 'cuda':
+            return audio, None
+        
+        device = self.whisper_model.device
+        samples = torch.from_numpy(np.ascontiguousarray(audio, dtype=np.float32))
+        with self._staging_lock:
+            if self._copy_stream is None:
+                self._copy_stream = torch.cuda.Stream(device)
+            # 上一段仍在自緩衝區複製時先等待，避免覆寫
+            if self._staging_ready is not None:
+                self._staging_ready.synchronize()
+            if self._staging_buffer is None or self._staging_buffer.numel() < samples.numel():
+                # 一次配置足夠 30 秒片段的空間，之後的片段直接重複使用
+                size = max(samples.numel(), 30 * self.whisper_sample_rate)
+                self._staging_buffer = torch.empty(size, dtype=torch.float32, pin_memory=True)
+            
+            staged = self._staging_buffer[:samples.numel()]
+            staged.copy_(samples)
+            with torch.cuda.stream(self._copy_stream):
+                tensor = staged.to(device, non_blocking=True)
+                ready = torch.cuda.Event()
+                ready.record(self._copy_stream)
+            self._staging_ready = ready
+        return tensor, ready
+    
+    def _whisper_transcribe(self, audio: np.ndarray, language: str = None, ready=None) -> Tuple[str, str]:
+        """單次 Whisper 識別，返回 (文字, 檢測語言)；ready 為 _stage_whisper_audio 的完成事件"""
+        with self._whisper_lock:
+            if ready is not None:
+                # 推論串流等待複製完成，張量改由推論串流管理
+                stream = torch.cuda.current_stream(audio.device)
+                stream.wait_event(ready)
+                audio.record_stream(stream)
+            
+            if self._whisper_is_ct2:
+                segments, info = self.whisper_model.transcribe(
+                    audio,
+                    language=language,
+                    beam_size=1,
+                    temperature=0.0,
+                    condition_on_previous_text=False,
+                    vad_filter=True,  # 內建 VAD 略過靜音
+                )
+                return "".join(segment.text for segment in segments).strip(), info.language
+            
             result = self.whisper_model.transcribe(
-                audio_path, 
-                language=None,  # 自動檢測
-                fp16=False,
+                audio, 
+                language=language,  # None 為自動檢測
+                fp16=self.whisper_model.device.type == 'cuda',  # GPU 上使用半精度
                 temperature=0.0,
                 condition_on_previous_text=False,
             )
+            return result["text"].strip(), result.get("language", "unknown")
+    
+    def _load_whisper_audio(self, audio_path: str) -> np.ndarray:
+        """讀取音頻文件供 Whisper 使用：WAV 直接讀取，其他格式才另外解碼（不必每段啟動 FFmpeg）"""
+        if self._whisper_is_ct2:
+            return decode_audio(audio_path, sampling_rate=self.whisper_sample_rate)  # PyAV，同一行程內解碼
+        try:
+            sample_rate, x = _read_wav_float(audio_path)
+        except ValueError:
+            return whisper.load_audio(audio_path)  # 非 WAV 格式
+        return self._to_whisper_audio(x, sample_rate)
+    
+    def _to_whisper_audio(self, samples: np.ndarray, sample_rate: int) -> np.ndarray:
+        """記憶體中的波形轉為 Whisper 需要的 16kHz 單聲道 float32"""
+        if samples.ndim > 1:
+            samples = samples.mean(axis=1)
+        if sample_rate != self.whisper_sample_rate:
+            divisor = np.gcd(int(sample_rate), self.whisper_sample_rate)
+            samples = scipy.signal.resample_poly(samples, self.whisper_sample_rate // divisor,
+                                                 int(sample_rate) // divisor)
+        return np.ascontiguousarray(samples, dtype=np.float32)
+    
+    def speech_to_text_whisper(self, audio_path: Union[str, np.ndarray], language: str = "zh") -> str:
+        """使用 Whisper 進行語音識別 - 改善語言檢測（可傳入路徑或 16kHz float32 陣列）"""
+        if not self.use_whisper or not self.whisper_model:
+            return ""
+        
+        try:
+            # 音頻只解碼一次，重試時直接使用同一陣列（GPU 上只複製一次）
+            if isinstance(audio_path, str):
+                audio = self._load_whisper_audio(audio_path)
+            else:
+                audio = audio_path
+            audio, ready = self._stage_whisper_audio(audio)
             
-            text = result["text"].strip()
-            detected_lang = result.get("language", "unknown")
+            # 第一次嘗試：自動檢測，但提供語言提示
+            text, detected_lang = self._whisper_transcribe(audio, None, ready)
             
-            print(f"      Whisper 檢測語言: {detected_lang}")
+            log.info("      Whisper 檢測語言: %s", detected_lang)
             
             # 如果自動檢測失敗或結果可疑，強制指定中文
             if detected_lang in ['nn', 'unknown', None] or not text or self.is_result_suspicious(text):
-                print(f"      語言檢測失敗或結果可疑，強制指定中文...")
+                log.info("      語言檢測失敗或結果可疑，強制指定中文...")
                 
                 # 嘗試多種中文設定
-                for lang_code in ['zh', 'zh-cn', 'zh-tw']:
+                for lang_code in self._WHISPER_RETRY_LANGS:
                     try:
-                        result2 = self.whisper_model.transcribe(
-                            audio_path, 
-                            language=lang_code,
-                            temperature=0.0,
-                            condition_on_previous_text=False,
-                        )
-                        text2 = result2["text"].strip()
+                        text2, _ = self._whisper_transcribe(audio, lang_code)
                         
                         if text2 and not self.is_result_suspicious(text2):
                             text = text2
-                            print(f"      使用 {lang_code} 成功: {text}")
+                            log.info("      使用 %s 成功: %s", lang_code, text)
                             break
                     except:
                         continue
@@ -354,14 +1130,14 @@ class SpeechRecognitionEngine:
             text = self.clean_whisper_result(text)
             
             if text:
-                print(f"      Whisper 最終結果: {text}")
+                log.info("      Whisper 最終結果: %s", text)
                 return text
             else:
-                print(f"      Whisper 無有效結果")
+                log.info("      Whisper 無有效結果")
                 return ""
             
         except Exception as e:
-            print(f"      Whisper 識別失敗: {e}")
+            log.warning("      Whisper 識別失敗: %s", e)
             return ""
 
     def is_result_suspicious(self, text: str) -> bool:
@@ -378,7 +1154,7 @@ class SpeechRecognitionEngine:
                 return True
         
         # 檢查是否包含奇怪字符
-        if any(char in text for char in ['♪', '♫', '[', ']', '(', ')', '*']):
+        if _SUSPICIOUS_CHARS.search(text):
             return True
         
         # 檢查長度異常
@@ -393,11 +1169,10 @@ class SpeechRecognitionEngine:
             return text
         
         # 移除音樂符號和標點
-        import re
-        text = re.sub(r'[♪♫\[\]\(\)\*]', '', text)
+        text = _SUSPICIOUS_CHARS.sub('', text)
         
         # 移除重複片段
-        text = self.remove_repetition(text)
+        text = self.remove_repetition(text, text.split())
         
         # 移除過短或過長的結果
         words = text.split()
@@ -406,68 +1181,86 @@ class SpeechRecognitionEngine:
         
         return text.strip()
     
-    def remove_repetition(self, text: str) -> str:
-        """移除文字中的重複片段"""
+    def remove_repetition(self, text: str, words: List[str] = None) -> str:
+        """移除文字中的重複片段（words 為已切分好的 text.split() 結果）"""
         if not text:
             return text
         
-        words = text.split()
+        if words is None:
+            words = text.split()
         if len(words) < 6:
             return text
         
-        # 檢測重複模式
-        for pattern_len in range(2, len(words) // 3 + 1):
-            for start in range(len(words) - pattern_len * 2 + 1):
-                pattern = words[start:start + pattern_len]
-                
-                # 檢查是否有連續重複
-                repeats = 1
-                pos = start + pattern_len
-                
-                while pos + pattern_len <= len(words):
-                    if words[pos:pos + pattern_len] == pattern:
-                        repeats += 1
-                        pos += pattern_len
-                    else:
-                        break
-                
-                # 如果重複超過2次，移除多餘部分
-                if repeats >= 3:
-                    # 保留一次，移除其他
-                    clean_words = words[:start + pattern_len] + words[pos:]
-                    return " ".join(clean_words)
+        # 詞語轉為整數編號，比較時不需切片建立新串列
+        token_ids = {}
+        tokens = [token_ids.setdefault(word, len(token_ids)) for word in words]
+        
+        tokens = np.asarray(tokens, dtype=np.int64)
+        if NUMBA_AVAILABLE:
+            start, pattern_len, pos = _find_repeat_native(tokens)
+        else:
+            start, pattern_len, pos = _find_repeat_numpy(tokens)
+        
+        # 如果重複超過2次，保留一次，移除其他
+        if start >= 0:
+            clean_words = words[:start + pattern_len] + words[pos:]
+            return " ".join(clean_words)
         
         return text
     ###
 
-    def speech_to_text(self, audio_chunk_path: str, language: str = 'chinese', 
-                  use_multi_strategy: bool = False, prefer_whisper: bool = True) -> str:
-        """語音轉文字 - 統一接口"""
-        
-        # 1. 先進行激進音頻增強
-        enhanced_path = self.aggressive_audio_enhancement(audio_chunk_path)
+    def speech_to_text(self, audio_chunk_path: Union[str, np.ndarray], language: str = 'chinese', 
+                  use_multi_strategy: bool = False, prefer_whisper: bool = True,
+                  sample_rate: int = None, backend: str = 'whisper') -> str:
+        """語音轉文字 - 統一接口（可傳入路徑，或波形與 sample_rate；backend 選擇本地模型）"""
         
         # 選擇語言代碼
-        lang_code = self.language_codes.get(language, 'zh-TW')
+        lang_code = SpeechRecognitionEngine._LANGUAGE_CODES.get(language, 'zh-TW')
         
         result = ""
 
+        # 短片段使用 Conformer (如果已載入；未載入時依 prefer_whisper 改用 Whisper 或 Google)
+        if backend == 'nemo_conformer' and self.use_conformer:
+            result = self.speech_to_text_conformer(audio_chunk_path, sample_rate)
+            if result:
+                return result
+            log.info("      Conformer 失敗，嘗試 Google 識別...")
+        
         # 優先使用 Whisper (如果可用且啟用)
-        if prefer_whisper and self.use_whisper:
+        elif prefer_whisper and self.use_whisper:
             # 轉換語言代碼
-            whisper_lang = "zh" if language in ['chinese', 'zh-TW', 'zh-CN'] else "en"
-            result = self.speech_to_text_whisper(audio_chunk_path, whisper_lang)
+            whisper_lang = "zh" if language in self._CHINESE_LANGUAGES else "en"
+            if isinstance(audio_chunk_path, str):
+                result = self.speech_to_text_whisper(audio_chunk_path, whisper_lang)
+            else:
+                result = self.speech_to_text_whisper(
+                    self._to_whisper_audio(audio_chunk_path, sample_rate or self.whisper_sample_rate), whisper_lang)
             
             if result:
                 return result
             else:
-                print("      Whisper 失敗，嘗試 Google 識別...")
+                log.info("      Whisper 失敗，嘗試 Google 識別...")
+        
+        if not isinstance(audio_chunk_path, str):
+            # Google 識別需要 WAV 文件，只在 Whisper 無結果時才寫出
+            with tempfile.NamedTemporaryFile(prefix="temp_stt_", suffix=".wav", dir=".", delete=False) as f:
+                _write_wav_int16(f, sample_rate or self.whisper_sample_rate, audio_chunk_path)
+            try:
+                return self.speech_to_text(f.name, language, use_multi_strategy, prefer_whisper=False)
+            finally:
+                Path(f.name).unlink(missing_ok=True)
+        
+        # 1. Google 識別前才進行激進音頻增強（Whisper 直接使用原始音頻）
+        enhanced_path = self.aggressive_audio_enhancement(audio_chunk_path)
         
         if use_multi_strategy:
             # 2. 使用增強後的音頻進行多引擎識別
             result = self.multi_engine_recognition(enhanced_path)
             if not result:
-                result = self.multi_recognition_strategy(enhanced_path, lang_code)
+                result = self.multi_recognition_strategy(
+                    enhanced_path, lang_code,
+                    _skip_enhancement=enhanced_path != audio_chunk_path  # 已增強過
+                )
         else:
             # 3. 預設使用多引擎識別
             result = self.multi_engine_recognition(enhanced_path)
@@ -475,16 +1268,13 @@ class SpeechRecognitionEngine:
                 result = self.speech_to_text_basic(enhanced_path, lang_code)
         
         # 4. 清理臨時文件
-        try:
-            if enhanced_path != audio_chunk_path:
-                os.remove(enhanced_path)
-        except:
-            pass
+        if enhanced_path != audio_chunk_path:
+            Path(enhanced_path).unlink(missing_ok=True)
         
         if result:
-            print(f"      最終識別結果: {result}")
+            log.info("      最終識別結果: %s", result)
         else:
-            print(f"      所有識別方法都失敗")
+            log.info("      所有識別方法都失敗")
         
         return result
     
\ No newline at end of file
@@ -1,14 +1,31 @@
 # video_muting_processor.py - 影片消音處理模組
-import os
 import subprocess
-from moviepy.editor import VideoFileClip, AudioFileClip, concatenate_audioclips
-from pydub import AudioSegment
-from typing import List, Dict
+import tempfile
+from pathlib import Path
+import numpy as np
+from moviepy.editor import VideoFileClip
+from moviepy.config import get_setting
+from typing import List, Dict, Tuple
+
+
+def _merge_intervals(profanity_segments: List[Dict]) -> List[Tuple[float, float]]:
+    """合併重疊或相鄰的消音區間（依開始時間排序）"""
+    merged = []
+    for start_time, end_time in sorted((s['start_time'], s['end_time']) for s in profanity_segments):
+        if merged and start_time <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end_time))
+        else:
+            merged.append((start_time, end_time))
+    return merged
 
 
 class VideoMutingProcessor:
     """影片消音處理器"""
     
+    def __init__(self):
+        # 本處理器建立的臨時音檔，處理完成後逐一刪除
+        self._silence_temp_paths: List[str] = []
+    
     def create_muted_video_with_ffmpeg(self, video_path: str, profanity_segments: List[Dict], 
                                       output_path: str = None) -> str:
         """使用FFmpeg創建消音影片，保持同步"""
@@ -23,11 +40,9 @@ class VideoMutingProcessor:
             else:
                 print(f"正在對 {len(profanity_segments)} 個片段進行消音...")
                 
-                # 創建音量過濾器
+                # 創建音量過濾器（重疊區間先合併，減少過濾器數量）
                 volume_filters = []
-                for segment in profanity_segments:
-                    start_time = segment['start_time']
-                    end_time = segment['end_time']
+                for start_time, end_time in _merge_intervals(profanity_segments):
                     # 在指定時間段將音量設為0
                     volume_filters.append(f"volume=0:enable='between(t,{start_time},{end_time})'")
                 
@@ -71,80 +86,79 @@ class VideoMutingProcessor:
             video = VideoFileClip(video_path)
             audio = video.audio
             
-            # 創建消音片段
-            if profanity_segments:
-                print(f"需要消音 {len(profanity_segments)} 個片段")
-                
-                # 使用 moviepy 進行消音處理
-                audio_clips = []
-                last_end = 0
-                
-                for segment in profanity_segments:
-                    start_time = segment['start_time']
-                    end_time = segment['end_time']
-                    
-                    # 添加正常音頻片段
-                    if start_time > last_end:
-                        normal_clip = audio.subclip(last_end, start_time)
-                        audio_clips.append(normal_clip)
-                    
-                    # 添加靜音片段
-                    duration = end_time - start_time
-                    silence = AudioSegment.silent(duration=int(duration * 1000))
-                    silence_path = f"temp_silence_{len(audio_clips)}.wav"
-                    silence.export(silence_path, format="wav")
-                    
-                    silence_clip = AudioFileClip(silence_path)
-                    audio_clips.append(silence_clip)
-                    
-                    last_end = end_time
-                
-                # 添加剩餘的正常音頻
-                if last_end < video.duration:
-                    final_clip = audio.subclip(last_end, video.duration)
-                    audio_clips.append(final_clip)
-                
-                # 合併音頻片段
-                if audio_clips:
-                    new_audio = concatenate_audioclips(audio_clips)
-                    
-                    # 創建新影片
-                    final_video = video.set_audio(new_audio)
-                    final_video.write_videofile(output_path, verbose=False, logger=None)
-                    
-                    # 清理
-                    for clip in audio_clips:
-                        clip.close()
-                    new_audio.close()
-                    final_video.close()
-                else:
-                    # 如果沒有音頻片段，直接複製原影片
-                    video.write_videofile(output_path, verbose=False, logger=None)
-            else:
+            if not profanity_segments or audio is None:
                 print("沒有檢測到特殊詞語，複製原影片")
-                video.write_videofile(output_path, verbose=False, logger=None)
+                video.close()
+                return self._mux_with_ffmpeg(video_path, None, output_path)
+            
+            print(f"需要消音 {len(profanity_segments)} 個片段")
+            
+            # 以遮罩將消音區間的取樣設為 0，不需逐段產生靜音檔再拼接
+            starts, ends = np.array(_merge_intervals(profanity_segments)).T
+            
+            def mute_frames(get_frame, t):
+                frames = get_frame(t)
+                times = np.atleast_1d(t)
+                muted = ((times[:, None] >= starts) & (times[:, None] <= ends)).any(axis=1)
+                if np.ndim(t) == 0:
+                    return frames * (0 if muted[0] else 1)
+                return frames * ~muted[:, None] if frames.ndim > 1 else frames * ~muted
+            
+            new_audio = audio.fl(mute_frames, keep_duration=True)
+            
+            # 只輸出音軌，影片串流直接複製（不重新編碼）
+            with tempfile.NamedTemporaryFile(prefix='temp_silence_', suffix='.wav', delete=False) as temp_file:
+                silence_path = temp_file.name
+            self._silence_temp_paths.append(silence_path)
+            new_audio.write_audiofile(silence_path, fps=audio.fps, verbose=False, logger=None)
             
+            new_audio.close()
             video.close()
             audio.close()
             
+            result_path = self._mux_with_ffmpeg(video_path, silence_path, output_path)
+            
             # 清理臨時文件
             self._cleanup_silence_files()
             
-            print(f"消音影片已保存到: {output_path}")
-            return output_path
+            return result_path
             
         except Exception as e:
             print(f"創建消音影片失敗: {e}")
+            self._cleanup_silence_files()
+            return None
+    
+    def _mux_with_ffmpeg(self, video_path: str, audio_path: str, output_path: str) -> str:
+        """以 MoviePy 附帶的 FFmpeg 複製影片串流並替換音軌（audio_path 為 None 時直接複製）"""
+        ffmpeg_binary = get_setting("FFMPEG_BINARY")
+        if audio_path is None:
+            cmd = [ffmpeg_binary, '-i', video_path, '-c', 'copy', '-y', output_path]
+        else:
+            cmd = [
+                ffmpeg_binary,
+                '-i', video_path,
+                '-i', audio_path,
+                '-map', '0:v', '-map', '1:a',
+                '-c:v', 'copy',              # 複製影片流（不重新編碼）
+                '-c:a', 'aac',               # 音頻編碼
+                '-y', output_path
+            ]
+        
+        result = subprocess.run(cmd, capture_output=True, text=True,
+                                encoding='utf-8', errors='ignore')
+        
+        if result.returncode == 0:
+            print(f"消音影片已保存到: {output_path}")
+            return output_path
+        else:
+            print(f"影片合併失敗: {result.stderr}")
             return None
     
     def _cleanup_silence_files(self):
         """清理靜音臨時文件"""
-        for f in os.listdir('.'):
-            if f.startswith('temp_silence_') and f.endswith('.wav'):
-                try:
-                    os.remove(f)
-                except:
-                    pass
+        for path in self._silence_temp_paths:
+            Path(path).unlink(missing_ok=True)
+        self._silence_temp_paths.clear()
     
     def create_muted_video(self, video_path: str, profanity_segments: List[Dict], 
                           output_path: str = None, use_ffmpeg: bool = True) -> str:
@@ -1,14 +1,47 @@
 # video_processor.py - 主要影片處理器
 import os
-from typing import List, Dict
-from audio_processor import AudioProcessor
+import queue
+import atexit
+import logging
+import logging.handlers
+import threading
+import numpy as np
+from collections import Counter
+from itertools import chain
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Tuple, Optional, Iterator, Union
+from audio_processor import AudioProcessor, AudioChunk, load_wav_np, dbfs_np, speech_ratio_np, segment_quality_issue
 from speech_recognition_engine import SpeechRecognitionEngine
 from profanity_detector import ProfanityDetector
 from video_muting_processor import VideoMutingProcessor
 
-#DEBUG
-from pydub.silence import detect_nonsilent
-from pydub import AudioSegment
+log = logging.getLogger(__name__)
+
+# 處理管線各模組的 logger（verbose 時輸出逐片段進度）
+_PIPELINE_LOGGERS = ('video_processor', 'audio_processor', 'speech_recognition_engine', 'profanity_detector')
+
+_log_listener = None
+_log_listener_lock = threading.Lock()
+
+
+def setup_queue_logging(level: Optional[int] = None,
+                        fmt: str = "%(message)s") -> logging.handlers.QueueListener:
+    """根 logger 改經佇列輸出：工作執行緒只放入紀錄，由單一背景執行緒格式化並寫出（重複呼叫只調整等級）"""
+    global _log_listener
+    root = logging.getLogger()
+    with _log_listener_lock:
+        if _log_listener is None:
+            log_queue = queue.SimpleQueue()
+            console = logging.StreamHandler()
+            console.setFormatter(logging.Formatter(fmt))
+            root.addHandler(logging.handlers.QueueHandler(log_queue))
+            _log_listener = logging.handlers.QueueListener(log_queue, console)
+            _log_listener.start()
+            atexit.register(_log_listener.stop)
+        if level is not None:
+            root.setLevel(level)
+    return _log_listener
 
 
 class VideoProfanityFilter:
@@ -26,23 +59,46 @@ class VideoProfanityFilter:
         self.precise_muting = False
         self.mute_padding = 0.5
         self.use_fuzzy_matching = True
+        self.use_early_exit = False  # 整段消音時找到第一個詞語即停止（結果只列出該詞語）
         self.use_multi_recognition = False
         self.use_overlap_segments = True
+        self.use_vad_segments = False  # 依語音活動分割（取代固定長度分割與品質預篩）
         self.use_ffmpeg = True
+        self.use_batch_recognition = False  # 批次識別（faster-whisper 批次推論，或需 Cloud 憑證的 Google）
+        self.max_workers = os.cpu_count() or 4  # 同時處理的片段數
+        self.verbose = False  # 輸出逐片段進度（預設只輸出警告）
         
         # 新增：訓練相關參數
         self.training_mode = False
         self.training_annotations = []
+        self._annotations_lock = threading.Lock()
 
         # Whisper 語音識別配置
         self.prefer_whisper = True
         self.whisper_model_size = "base"  # tiny, base, small, medium, large
+        self.whisper_compute_type = "int8"  # faster-whisper 精度（GPU 上為 int8_float16）
+        self.whisper_device = "auto"  # auto, cuda, cpu
+        
+        # 片段識別的本地模型：whisper 或 nemo_conformer（短片段較快；訓練片段仍使用 Whisper）
+        self.stt_backend = "whisper"
+        
+        # faster-whisper 整檔識別（逐字時間戳，不需切割片段）
+        self.use_full_transcription = False
+        self.full_transcription_model_size = "large-v3"
+        
+        # 背景預先載入模型的執行緒（prewarm_whisper 或處理影片時啟動）
+        self._prewarm_thread = None
     
     def configure_settings(self, **kwargs):
         """配置系統設定"""
+        previous_whisper_settings = self._whisper_settings()
+        
         if 'chunk_duration' in kwargs:
             self.chunk_duration = kwargs['chunk_duration']
             self.audio_processor.chunk_duration = kwargs['chunk_duration']
+            if self.chunk_duration < 15 and self.stt_backend == 'whisper' and 'stt_backend' not in kwargs:
+                print("提示: 片段短於 15 秒時 Whisper 仍補零到 30 秒，"
+                      "可設定 stt_backend='nemo_conformer' 加快識別")
         
         if 'precise_muting' in kwargs:
             self.precise_muting = kwargs['precise_muting']
@@ -53,14 +109,33 @@ class VideoProfanityFilter:
         if 'use_fuzzy_matching' in kwargs:
             self.use_fuzzy_matching = kwargs['use_fuzzy_matching']
         
+        if 'use_early_exit' in kwargs:
+            self.use_early_exit = kwargs['use_early_exit']
+        
         if 'use_multi_recognition' in kwargs:
             self.use_multi_recognition = kwargs['use_multi_recognition']
         
         if 'use_overlap_segments' in kwargs:
             self.use_overlap_segments = kwargs['use_overlap_segments']
         
+        if 'use_vad_segments' in kwargs:
+            self.use_vad_segments = kwargs['use_vad_segments']
+        
         if 'use_ffmpeg' in kwargs:
             self.use_ffmpeg = kwargs['use_ffmpeg']
+        
+        if 'max_workers' in kwargs:
+            self.max_workers = max(1, kwargs['max_workers'])
+        
+        if 'verbose' in kwargs:
+            self.verbose = kwargs['verbose']
+            self._apply_verbosity()
+        
+        if 'use_batch_recognition' in kwargs:
+            self.use_batch_recognition = kwargs['use_batch_recognition']
+        
+        if 'google_cloud_credentials' in kwargs:
+            self.speech_engine.google_cloud_credentials = kwargs['google_cloud_credentials']
             
         # 新增：自適應檢測相關設定
         if 'enable_adaptive_detection' in kwargs:
@@ -74,21 +149,80 @@ class VideoProfanityFilter:
         if 'prefer_whisper' in kwargs:
             self.prefer_whisper = kwargs['prefer_whisper']
         
+        if 'whisper_compute_type' in kwargs:
+            self.whisper_compute_type = kwargs['whisper_compute_type']
+        
+        if 'whisper_device' in kwargs:
+            self.whisper_device = kwargs['whisper_device']
+        
         if 'whisper_model_size' in kwargs:
             self.whisper_model_size = kwargs['whisper_model_size']
-            # 重新載入模型
-            if self.prefer_whisper:
-                self.speech_engine.load_whisper_model(self.whisper_model_size)
+        
+        if 'stt_backend' in kwargs:
+            self.stt_backend = kwargs['stt_backend']
+            if self.stt_backend == 'nemo_conformer' and not self.speech_engine.load_conformer_model():
+                print("Conformer 無法使用，改用 Whisper")
+                self.stt_backend = 'whisper'
+        
+        # 模型設定確實改變時才重新載入
+        if self._whisper_settings() != previous_whisper_settings and self.prefer_whisper:
+            self.load_whisper_model()
+        
+        if 'use_full_transcription' in kwargs:
+            self.use_full_transcription = kwargs['use_full_transcription']
+        
+        if 'full_transcription_model_size' in kwargs:
+            self.full_transcription_model_size = kwargs['full_transcription_model_size']
 
     # Whisper boolean          
     def initialize_speech_engine(self):
         """初始化語音識別引擎"""
+        if self.stt_backend == 'nemo_conformer':
+            if self.speech_engine.load_conformer_model():
+                return
+            print("Conformer 初始化失敗，將使用 Whisper")
+            self.stt_backend = 'whisper'
+        
         if self.prefer_whisper:
-            success = self.speech_engine.load_whisper_model(self.whisper_model_size)
+            success = self.load_whisper_model()
             if not success:
                 print("Whisper 初始化失敗，將使用 Google 識別")
                 self.prefer_whisper = False
     
+    def _apply_verbosity(self):
+        """verbose 時管線 logger 輸出 INFO，否則沿用根 logger 的等級"""
+        root = logging.getLogger()
+        if self.verbose and not root.handlers:
+            setup_queue_logging()
+        level = logging.INFO if self.verbose and root.getEffectiveLevel() > logging.INFO else logging.NOTSET
+        for name in _PIPELINE_LOGGERS:
+            logging.getLogger(name).setLevel(level)
+    
+    def prewarm_whisper(self) -> Optional[threading.Thread]:
+        """背景載入並暖機目前設定的 Whisper 模型，第一次識別不必等待"""
+        if not self.prefer_whisper:
+            return None
+        self._prewarm_thread = self.speech_engine.prewarm(*self._whisper_settings())
+        return self._prewarm_thread
+    
+    def _needs_engine_init(self) -> bool:
+        """選用的本地模型是否尚未載入"""
+        if self.stt_backend == 'nemo_conformer':
+            return not self.speech_engine.use_conformer
+        return self.prefer_whisper and not self.speech_engine.use_whisper
+    
+    def _whisper_settings(self) -> Tuple[str, str, str]:
+        """目前的 Whisper 模型設定 (大小, 精度, 裝置)"""
+        return self.whisper_model_size, self.whisper_compute_type, self.whisper_device
+    
+    def load_whisper_model(self, model_size: str = None) -> bool:
+        """依目前的精度與裝置設定載入 Whisper 模型"""
+        if model_size is not None:
+            self.whisper_model_size = model_size
+        return self.speech_engine.load_whisper_model(self.whisper_model_size,
+                                                     compute_type=self.whisper_compute_type,
+                                                     device=self.whisper_device)
+    
     def add_custom_profanity(self, words: List[str]):
         """添加自定義特殊詞語詞庫"""
         self.profanity_detector.add_custom_profanity(words)
@@ -97,116 +231,312 @@ class VideoProfanityFilter:
         """處理影片片段，返回需要消音的時間段"""
         print("開始語音辨識和特殊詞語檢測...")
         
+        # 整檔識別（失敗時退回片段識別）
+        if self.use_full_transcription:
+            full_segments = self.process_full_transcription(audio_path, language)
+            if full_segments is not None:
+                return full_segments
+        
         # 確保語音引擎已初始化
-        if self.prefer_whisper and not self.speech_engine.use_whisper:
+        if self._needs_engine_init():
             self.initialize_speech_engine()
 
-        # 選擇分割策略
-        if self.use_overlap_segments:
-            chunks = self.audio_processor.split_audio_with_overlap(audio_path)
-        else:
-            chunks = self.audio_processor.split_audio_chunks(audio_path, self.chunk_duration)
-        
         profanity_segments = []
         
-        for i, (chunk_path, start_time, end_time) in enumerate(chunks):
-            print(f"處理片段 {i+1}/{len(chunks)}: {start_time:.1f}s - {end_time:.1f}s")
+        # 分割執行緒邊寫出片段邊放入佇列，識別不必等整段分割完成
+        chunk_queue = queue.Queue()
+        splitter = threading.Thread(target=self._produce_chunks, args=(self._iter_chunks(audio_path), chunk_queue),
+                                    daemon=True)
+        splitter.start()
+        
+        # 環境噪音只由完整音頻校正一次，各片段共用（與分割同時進行）
+        self.speech_engine.calibrate_ambient_noise(audio_path)
+        
+        # 批次識別（faster-whisper 或 Google）：需要全部片段，先分割完再一次送出
+        batch_texts = None
+        conformer_active = self.stt_backend == 'nemo_conformer' and self.speech_engine.use_conformer
+        whisper_active = not conformer_active and self.prefer_whisper and self.speech_engine.use_whisper
+        use_batch = self.use_batch_recognition and (not whisper_active or self.speech_engine.can_batch_whisper())
+        
+        if use_batch:
+            chunks = list(iter(chunk_queue.get, None))
+            if conformer_active:
+                texts = self.speech_engine.speech_to_text_conformer_batch(
+                    [chunk.samples for chunk in chunks],
+                    sample_rate=chunks[0].sample_rate if chunks else None)
+            elif whisper_active:
+                # Whisper 批次直接使用記憶體中的波形
+                texts = self.speech_engine.speech_to_text_whisper_batch(
+                    [chunk.samples for chunk in chunks], language,
+                    sample_rate=chunks[0].sample_rate if chunks else None)
+            else:
+                texts = self.speech_engine.speech_to_text_batch([chunk.path for chunk in chunks], language)
+            batch_texts = dict(zip(chunks, texts))
+            chunk_source = iter(chunks)
+        else:
+            chunks = []
+            chunk_source = iter(chunk_queue.get, None)
+        
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            # 1. 各片段互不相依，一到達即送去識別
+            futures = []
+            segment_futures = []
+            released = 0
+            for chunk in chunk_source:
+                if not use_batch:
+                    chunks.append(chunk)
+                futures.append(executor.submit(self._recognize_chunk, len(futures), len(chunks) if use_batch else None,
+                                               chunk, language, batch_texts))
+                # 2. 已完成的前綴依時間順序批次檢測並定位，與其餘片段的識別重疊進行
+                released = self._release_recognized(executor, chunks, futures, released, segment_futures, block=False)
             
-            # 先檢查音頻品質
-            if not self.check_segment_quality(chunk_path):
-                print("      音頻品質不足，跳過此片段")
-                continue
-
-            # 語音轉文字
+            released = self._release_recognized(executor, chunks, futures, released, segment_futures, block=True)
+            splitter.join()
+            
+            # 3. 依時間順序收集消音時間
+            for future in segment_futures:
+                try:
+                    profanity_segments.extend(future.result())
+                except Exception as e:
+                    print(f"消音時間定位失敗: {e}")
+        
+        return profanity_segments
+    
+    def _iter_chunks(self, audio_path: str) -> Iterator[AudioChunk]:
+        """依設定選擇分割策略（固定長度分割在分割時即略過品質不足的片段）"""
+        if self.use_vad_segments:
+            return self.audio_processor.iter_audio_with_vad(audio_path)
+        if self.use_overlap_segments:
+            return self.audio_processor.iter_audio_with_overlap(audio_path, skip_low_quality=True)
+        return self.audio_processor.iter_audio_chunks(audio_path, self.chunk_duration, skip_low_quality=True)
+    
+    def _produce_chunks(self, chunk_iter: Iterator[AudioChunk], chunk_queue: queue.Queue):
+        """分割執行緒：逐一放入片段，結束時放入 None"""
+        try:
+            for chunk in chunk_iter:
+                chunk_queue.put(chunk)
+        finally:
+            chunk_queue.put(None)
+    
+    def _release_recognized(self, executor: ThreadPoolExecutor, chunks: List[AudioChunk],
+                            futures: List, released: int, segment_futures: List, block: bool) -> int:
+        """取出從 released 起連續完成的識別結果，批次檢測後提交定位工作，返回新的 released"""
+        recognized_chunks = []
+        while released < len(futures) and (block or futures[released].done()):
+            try:
+                text = futures[released].result()
+            except Exception as e:
+                log.warning("片段 %d 識別失敗: %s", released + 1, e)
+                text = None
+            if text:
+                recognized_chunks.append((chunks[released], text))
+            released += 1
+        
+        if not recognized_chunks:
+            return released
+        
+        # 自適應檢測需要音頻文件，未啟用時不寫出片段
+        detector = self.profanity_detector
+        needs_audio = detector.use_adaptive_detection and detector.adaptive_trainer.is_trained
+        # 啟用 use_early_exit、整段消音且不收集訓練資料時，只需知道是否命中，找到第一個詞語即可停止
+        detection_results = detector.detect_profanity_batch(
+            [text for _, text in recognized_chunks],
+            [chunk.path if needs_audio else "" for chunk, _ in recognized_chunks],
+            use_fuzzy=self.use_fuzzy_matching,
+            early_exit=self.use_early_exit and not self.precise_muting and not self.training_mode
+        )
+        
+        # 精確定位需分析音頻，同樣並行
+        segment_futures.extend(
+            executor.submit(self._locate_profanity_segments, chunk, text, detection_result)
+            for (chunk, text), detection_result in zip(recognized_chunks, detection_results)
+        )
+        return released
+    
+    def _recognize_chunk(self, index: int, total: Optional[int], chunk: AudioChunk, language: str = 'chinese',
+                         batch_texts: Optional[Dict[AudioChunk, str]] = None) -> Optional[str]:
+        """識別單一片段，返回識別文字；品質不足或無法識別時返回 None"""
+        progress = f"{index + 1}/{total}" if total else f"{index + 1}"
+        log.info("處理片段 %s: %.1fs - %.1fs", progress, chunk.start_time, chunk.end_time)
+        
+        # 品質不足的片段已在分割時略過（語音活動分割的片段只含語音）
+        if batch_texts is not None:
+            text = batch_texts[chunk]
+        else:
+            # 語音轉文字（直接傳入波形，Google 備援時才寫出文件）
             text = self.speech_engine.speech_to_text(
-                chunk_path, 
+                chunk.samples, 
                 language, 
                 use_multi_strategy=self.use_multi_recognition,
-                prefer_whisper=self.prefer_whisper
+                prefer_whisper=self.prefer_whisper,
+                sample_rate=chunk.sample_rate,
+                backend=self.stt_backend
+            )
+        
+        if text:
+            log.info("識別文字: %s", text)
+            return text
+        
+        log.info("無法識別語音")
+        # 診斷問題
+        self.diagnose_failed_recognition(chunk, chunk.start_time, chunk.end_time)
+        return None  # 跳過此片段
+    
+    def _locate_profanity_segments(self, chunk: AudioChunk, text: str, detection_result: Dict) -> List[Dict]:
+        """依檢測結果計算消音時間段"""
+        profanity_segments = []
+        start_time, end_time = chunk.start_time, chunk.end_time
+        
+        if not detection_result['found_profanity']:
+            return profanity_segments
+        
+        log.info("檢測結果: %s", detection_result)
+        
+        # 如果是訓練模式，記錄數據供後續標註
+        if self.training_mode:
+            with self._annotations_lock:
+                self.training_annotations.append({
+                    'segment_path': chunk.path,
+                    'start_time': start_time,
+                    'end_time': end_time,
+                    'text': text,
+                    'detection_result': detection_result,
+                    'auto_label': 'profanity' if detection_result['confidence'] > 0.7 else 'uncertain'
+                })
+        
+        if self.precise_muting:
+            # 一次定位所有特殊詞語的時間（跳過自適應檢測的標記）
+            timings_by_word = self.audio_processor.find_word_timings_in_segment(
+                chunk, text, [w for w in detection_result['found_profanity'] if w != '訓練模型檢測'], start_time
             )
+            for word, word_timings in timings_by_word.items():
+                for precise_start, precise_end in word_timings:
+                    # 加上緩衝時間
+                    buffered_start = precise_start - self.mute_padding
+                    buffered_end = precise_end + self.mute_padding
+                    
+                    # 確保不超出原片段範圍
+                    buffered_start = max(start_time, buffered_start)
+                    buffered_end = min(end_time, buffered_end)
+                    
+                    profanity_segments.append({
+                        'start_time': buffered_start,
+                        'end_time': buffered_end,
+                        'text': word,
+                        'profanity': [word],
+                        'duration': buffered_end - buffered_start,
+                        'confidence': detection_result['confidence'],
+                        'methods': detection_result['methods_used']
+                    })
+        else:
+            # 整段消音
+            profanity_segments.append({
+                'start_time': start_time,
+                'end_time': end_time,
+                'text': text,
+                'profanity': detection_result['found_profanity'],
+                'duration': end_time - start_time,
+                'confidence': detection_result['confidence'],
+                'methods': detection_result['methods_used']
+            })
+        
+        return profanity_segments
+    
+    def process_full_transcription(self, audio_path: str, language: str = 'chinese') -> Optional[List[Dict]]:
+        """使用 faster-whisper 整檔識別並檢測，返回需要消音的時間段；不可用時返回 None"""
+        if not self.speech_engine.load_faster_whisper_model(self.full_transcription_model_size):
+            print("整檔識別不可用，改用片段識別")
+            return None
+        
+        try:
+            segments = self.speech_engine.transcribe_full(audio_path, language)
+        except Exception as e:
+            print(f"整檔識別失敗: {e}，改用片段識別")
+            return None
+        
+        profanity_segments = []
+        
+        for segment in segments:
+            text = segment['text']
+            if not text:
+                continue
             
-            if text:
-                print(f"識別文字: {text}")
-            else:
-                print("無法識別語音")
-                # 診斷問題
-                self.diagnose_failed_recognition(chunk_path, start_time, end_time)
-                continue  # 跳過此片段
+            log.info("%.1fs - %.1fs: %s", segment['start'], segment['end'], text)
             
-            # 增強的特殊詞語檢測（整合文字和音頻）
+            # 沒有獨立的片段音檔，只進行文字檢測
             detection_result = self.profanity_detector.detect_profanity(
                 text=text,
-                audio_segment_path=chunk_path,
                 use_fuzzy=self.use_fuzzy_matching
             )
             
-            if detection_result['found_profanity']:
-                print(f"檢測結果: {detection_result}")
-                
-                # 如果是訓練模式，記錄數據供後續標註
-                if self.training_mode:
-                    self.training_annotations.append({
-                        'segment_path': chunk_path,
-                        'start_time': start_time,
-                        'end_time': end_time,
-                        'text': text,
-                        'detection_result': detection_result,
-                        'auto_label': 'profanity' if detection_result['confidence'] > 0.7 else 'uncertain'
-                    })
+            if not detection_result['found_profanity']:
+                continue
+            
+            log.info("檢測結果: %s", detection_result)
+            
+            for word in detection_result['found_profanity']:
+                # 直接使用逐字時間戳；模糊匹配等找不到原文時整段消音
+                word_timings = self._find_word_timing_in_words(segment['words'], word) if self.precise_muting else []
+                if not word_timings:
+                    word_timings = [(segment['start'], segment['end'])]
                 
-                if self.precise_muting:
-                    # 精確定位每個特殊詞語的時間
-                    for word in detection_result['found_profanity']:
-                        if word != '訓練模型檢測':  # 跳過自適應檢測的標記
-                            word_timings = self.audio_processor.find_word_timing_in_segment(
-                                chunk_path, text, word, start_time
-                            )
-                            
-                            for precise_start, precise_end in word_timings:
-                                # 加上緩衝時間
-                                buffered_start = precise_start - self.mute_padding
-                                buffered_end = precise_end + self.mute_padding
-                                
-                                # 確保不超出原片段範圍
-                                buffered_start = max(start_time, buffered_start)
-                                buffered_end = min(end_time, buffered_end)
-                                
-                                profanity_segments.append({
-                                    'start_time': buffered_start,
-                                    'end_time': buffered_end,
-                                    'text': word,
-                                    'profanity': [word],
-                                    'duration': buffered_end - buffered_start,
-                                    'confidence': detection_result['confidence'],
-                                    'methods': detection_result['methods_used']
-                                })
-                else:
-                    # 整段消音
+                for precise_start, precise_end in word_timings:
+                    buffered_start = max(0.0, precise_start - self.mute_padding)
+                    buffered_end = precise_end + self.mute_padding
+                    
                     profanity_segments.append({
-                        'start_time': start_time,
-                        'end_time': end_time,
-                        'text': text,
-                        'profanity': detection_result['found_profanity'],
-                        'duration': end_time - start_time,
+                        'start_time': buffered_start,
+                        'end_time': buffered_end,
+                        'text': word if self.precise_muting else text,
+                        'profanity': [word] if self.precise_muting else detection_result['found_profanity'],
+                        'duration': buffered_end - buffered_start,
                         'confidence': detection_result['confidence'],
                         'methods': detection_result['methods_used']
                     })
-            
-            # 清理臨時文件
-            try:
-                os.remove(chunk_path)
-            except:
-                pass
+                
+                if not self.precise_muting:
+                    break  # 整段消音只需一筆
         
         return profanity_segments
     
+    def _find_word_timing_in_words(self, words: List[Dict], target_word: str) -> List[Tuple[float, float]]:
+        """在逐字時間戳中找出目標詞語的時間範圍"""
+        joined = ""
+        char_owner = []  # 每個字元屬於哪個 word
+        for index, word in enumerate(words):
+            token = word['word'].lower()
+            joined += token
+            char_owner.extend([index] * len(token))
+        
+        target_lower = target_word.lower()
+        timings = []
+        pos = joined.find(target_lower)
+        while pos != -1 and target_lower:
+            first = words[char_owner[pos]]
+            last = words[char_owner[pos + len(target_lower) - 1]]
+            timings.append((first['start'], last['end']))
+            pos = joined.find(target_lower, pos + 1)
+        
+        return timings
+    
     def process_video(self, video_path: str, output_path: str = None, language: str = 'chinese') -> str:
         """完整的影片處理流程"""
         print(f"開始處理影片: {video_path}")
         
         try:
+            # 模型載入（Whisper 並暖機）與音頻提取互不相依，同時進行
+            engine_loader = None
+            if self._needs_engine_init() and not self.use_full_transcription:
+                if self.stt_backend == 'whisper':
+                    engine_loader = self.prewarm_whisper()
+                else:
+                    engine_loader = threading.Thread(target=self.initialize_speech_engine, daemon=True)
+                    engine_loader.start()
+            
             # 1. 提取音頻
             audio_path = self.audio_processor.extract_audio_from_video(video_path)
+            if engine_loader is not None:
+                engine_loader.join()
             if not audio_path:
                 return None
             
@@ -221,12 +551,8 @@ class VideoProfanityFilter:
                 use_ffmpeg=self.use_ffmpeg
             )
             
-            # 4. 清理臨時文件
-            try:
-                os.remove(audio_path)
-            except:
-                pass
-            
+            # 4. 清理臨時文件（片段文件在此一次清理）
+            Path(audio_path).unlink(missing_ok=True)
             self.audio_processor.cleanup_temp_files()
             
             # 5. 顯示處理結果
@@ -244,12 +570,9 @@ class VideoProfanityFilter:
             print(f"\n處理完成！共檢測到 {len(profanity_segments)} 個不當用詞片段:")
             
             # 統計檢測方法
-            method_stats = {}
-            for segment in profanity_segments:
-                for method in segment.get('methods', []):
-                    method_stats[method] = method_stats.get(method, 0) + 1
+            method_stats = Counter(chain.from_iterable(segment.get('methods', ()) for segment in profanity_segments))
             
-            print(f"檢測方法統計: {method_stats}")
+            print(f"檢測方法統計: {dict(method_stats)}")
             
             for i, segment in enumerate(profanity_segments, 1):
                 duration = segment.get('duration', 0)
@@ -329,42 +652,32 @@ class VideoProfanityFilter:
             if not audio_path:
                 return []
             
+            # 訓練片段固定使用 Whisper 識別（不受 stt_backend 影響）
+            if self.prefer_whisper and not self.speech_engine.use_whisper:
+                self.load_whisper_model()
+            
             # 創建短片段用於標註
             original_duration = self.audio_processor.chunk_duration
             self.audio_processor.chunk_duration = segment_duration
             
-            chunks = self.audio_processor.split_audio_chunks(audio_path, segment_duration)
+            chunks = list(self.audio_processor.iter_audio_chunks(audio_path, segment_duration))
             
-            training_segments = []
-            for i, (chunk_path, start_time, end_time) in enumerate(chunks):
-                # 執行初步語音識別
-                text = self.speech_engine.speech_to_text(chunk_path)
-                
-                # 執行初步檢測
-                detection_result = self.profanity_detector.detect_profanity(
-                    text=text, 
-                    use_fuzzy=True
-                )
-                
-                training_segments.append({
-                    'segment_id': i,
-                    'segment_path': chunk_path,
-                    'start_time': start_time,
-                    'end_time': end_time,
-                    'text': text,
-                    'initial_detection': detection_result,
-                    'suggested_label': 'profanity' if detection_result['found_profanity'] else 'normal',
-                    'label': None  # 待用戶標註
-                })
+            # 支援批次推論時一次識別全部片段（直接使用記憶體中的波形）
+            texts = [None] * len(chunks)
+            if chunks and self.prefer_whisper and self.speech_engine.can_batch_whisper():
+                texts = self.speech_engine.speech_to_text_whisper_batch(
+                    [chunk.samples for chunk in chunks], sample_rate=chunks[0].sample_rate)
+            
+            # 各片段互不相依，同時識別與檢測；map 依原順序返回
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                training_segments = list(executor.map(self._build_training_segment,
+                                                      range(len(chunks)), chunks, texts))
             
             # 恢復原設定
             self.audio_processor.chunk_duration = original_duration
             
             # 清理音頻文件
-            try:
-                os.remove(audio_path)
-            except:
-                pass
+            Path(audio_path).unlink(missing_ok=True)
             
             print(f"已創建 {len(training_segments)} 個訓練片段")
             return training_segments
@@ -373,60 +686,73 @@ class VideoProfanityFilter:
             print(f"創建訓練片段失敗: {e}")
             return []
         
+    def _build_training_segment(self, i: int, chunk: AudioChunk, text: Optional[str] = None) -> Dict:
+        """識別並初步檢測單一訓練片段（text 為批次識別結果）"""
+        if text is None:
+            # 執行初步語音識別
+            text = self.speech_engine.speech_to_text(chunk.samples, sample_rate=chunk.sample_rate)
+        
+        # 執行初步檢測
+        detection_result = self.profanity_detector.detect_profanity(
+            text=text, 
+            use_fuzzy=True
+        )
+        
+        return {
+            'segment_id': i,
+            'segment_path': chunk.path,  # 標註需要文件
+            'start_time': chunk.start_time,
+            'end_time': chunk.end_time,
+            'text': text,
+            'initial_detection': detection_result,
+            'suggested_label': 'profanity' if detection_result['found_profanity'] else 'normal',
+            'label': None  # 待用戶標註
+        }
+    
     #DEBUG
-    def diagnose_failed_recognition(self, chunk_path: str, start_time: float, end_time: float):
+    def _load_chunk_audio(self, chunk: Union[str, AudioChunk]) -> Tuple[np.ndarray, int]:
+        """取得片段波形（記憶體中的片段不需再解碼）"""
+        if isinstance(chunk, AudioChunk):
+            return chunk.samples, chunk.sample_rate
+        return load_wav_np(chunk)
+    
+    def diagnose_failed_recognition(self, chunk_path: Union[str, AudioChunk], start_time: float, end_time: float):
         """診斷識別失敗的原因"""
         try:
-            audio = AudioSegment.from_wav(chunk_path)
-            print(f"      診斷 {start_time:.1f}s-{end_time:.1f}s:")
-            print(f"        音量: {audio.dBFS:.1f} dBFS")
-            print(f"        時長: {len(audio)/1000:.1f} 秒")
-            print(f"        最大音量: {audio.max_dBFS:.1f} dBFS")
-            
+            samples, sample_rate = self._load_chunk_audio(chunk_path)
+            dbfs = dbfs_np(samples)
+            peak = float(np.max(np.abs(samples))) if samples.size else 0.0
             # 檢查是否主要是靜音
-            from pydub.silence import detect_nonsilent
-            nonsilent = detect_nonsilent(audio, min_silence_len=200, silence_thresh=audio.dBFS-15)
-            speech_ratio = sum(end-start for start, end in nonsilent) / len(audio) if nonsilent else 0
-            print(f"        語音比例: {speech_ratio:.2f}")
+            speech_ratio = speech_ratio_np(samples, sample_rate, min_silence_ms=200, silence_thresh_db=dbfs - 15)
             
-            if audio.dBFS < -40:
-                print("        問題: 音量太小")
+            if dbfs < -40:
+                problem = "音量太小"
             elif speech_ratio < 0.2:
-                print("        問題: 主要是靜音或背景音")
+                problem = "主要是靜音或背景音"
             else:
-                print("        問題: 可能是語音不清楚或語言識別問題")
+                problem = "可能是語音不清楚或語言識別問題"
+            
+            # 合併為一筆紀錄，多執行緒時各行不會交錯
+            log.info("      診斷 %.1fs-%.1fs:\n"
+                     "        音量: %.1f dBFS\n"
+                     "        時長: %.1f 秒\n"
+                     "        最大音量: %.1f dBFS\n"
+                     "        語音比例: %.2f\n"
+                     "        問題: %s",
+                     start_time, end_time, dbfs, len(samples) / sample_rate,
+                     20 * np.log10(peak) if peak > 0 else -float('inf'), speech_ratio, problem)
                 
         except Exception as e:
-            print(f"      診斷失敗: {e}")
+            log.warning("      診斷失敗: %s", e)
     
-    def check_segment_quality(self, audio_path: str) -> bool:
+    def check_segment_quality(self, audio_path: Union[str, AudioChunk]) -> bool:
         """檢查音頻片段品質"""
         try:
-            audio = AudioSegment.from_wav(audio_path)
-            
-            # 檢查時長
-            if len(audio) < 2000:  # 少於2秒
-                print(f"      片段過短: {len(audio)/1000:.1f}s")
-                return False
-            
-            # 檢查音量
-            if audio.dBFS < -50:
-                print(f"      音量過小: {audio.dBFS:.1f}dB")
-                return False
-            
-            # 檢查是否主要是靜音
-            from pydub.silence import detect_nonsilent
-            nonsilent = detect_nonsilent(audio, min_silence_len=300, silence_thresh=audio.dBFS-15)
-            
-            if not nonsilent:
-                print(f"      主要是靜音")
-                return False
-            
-            speech_ratio = sum(end-start for start, end in nonsilent) / len(audio)
-            if speech_ratio < 0.3:
-                print(f"      語音比例過低: {speech_ratio:.2f}")
+            samples, sample_rate = self._load_chunk_audio(audio_path)
+            issue = segment_quality_issue(samples, sample_rate)
+            if issue:
+                print(f"      {issue}")
                 return False
-            
             return True
-        except:
-            return False
\ No newline at end of file
+        except Exception:
+            return False
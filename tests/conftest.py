@@ -0,0 +1,5 @@
+# conftest.py - 測試時將 src/ 加入模組搜尋路徑（模組皆為 src/ 下的平面模組）
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
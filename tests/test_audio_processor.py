@@ -0,0 +1,101 @@
+# test_audio_processor.py - 語音活動分割測試
+import numpy as np
+import pytest
+from scipy.io import wavfile
+
+import audio_processor
+from audio_processor import AudioProcessor
+
+SAMPLE_RATE = 44100
+# (開始秒, 結束秒) 的 440 Hz 純音，其餘為靜音
+TONES = ((0.5, 1.5), (2.2, 2.8))
+FRAME = 0.03  # iter_audio_with_vad 的幀長
+# 語音結束後保留的停頓：min_sil=0.1 取整為 4 幀，最後一幀語音可能只含部分純音
+TAIL = FRAME + 4 * FRAME
+
+
+@pytest.fixture
+def tone_wav(tmp_path):
+    t = np.arange(3 * SAMPLE_RATE) / SAMPLE_RATE
+    samples = np.zeros_like(t)
+    for start, end in TONES:
+        on = (t >= start) & (t < end)
+        samples[on] = 0.5 * np.sin(2 * np.pi * 440 * t[on])
+    path = tmp_path / "tone.wav"
+    wavfile.write(path, SAMPLE_RATE, (samples * 32767).astype(np.int16))
+    return str(path)
+
+
+@pytest.fixture(autouse=True)
+def energy_vad(monkeypatch):
+    """純音不一定被 WebRTC VAD 視為語音，固定使用能量門檻"""
+    monkeypatch.setattr(audio_processor, "WEBRTCVAD_AVAILABLE", False)
+
+
+def test_vad_splits_at_silence(tone_wav):
+    """片段從語音開始的幀起算，結束時保留 min_sil 長度的停頓"""
+    chunks = list(AudioProcessor().iter_audio_with_vad(tone_wav, min_sil=0.1, min_len=0.2))
+
+    assert len(chunks) == len(TONES)
+    for chunk, (start, end) in zip(chunks, TONES):
+        assert start - FRAME <= chunk.start_time <= start
+        assert end <= chunk.end_time <= end + TAIL
+        assert chunk.sample_rate == SAMPLE_RATE
+        assert len(chunk.samples) == round((chunk.end_time - chunk.start_time) * SAMPLE_RATE)
+
+
+def test_vad_keeps_short_pauses_inside_min_len(tone_wav):
+    """未達 min_len 且停頓短於 1 秒時不切開"""
+    chunks = list(AudioProcessor().iter_audio_with_vad(tone_wav, min_sil=0.1, min_len=2.0))
+
+    assert len(chunks) == 1
+    assert TONES[0][0] - FRAME <= chunks[0].start_time <= TONES[0][0]
+    assert TONES[-1][1] <= chunks[0].end_time <= TONES[-1][1] + TAIL
+
+
+def test_vad_respects_max_len(tone_wav):
+    chunks = list(AudioProcessor().iter_audio_with_vad(tone_wav, min_sil=0.1, max_len=0.6, min_len=0.2))
+
+    assert len(chunks) > len(TONES)
+    assert all(chunk.end_time - chunk.start_time <= 0.6 + 1e-9 for chunk in chunks)
+    assert all(earlier.end_time <= later.start_time for earlier, later in zip(chunks, chunks[1:]))
+
+
+def test_detect_speech_frames_downmixes_stereo():
+    """立體聲與單聲道得到相同的逐幀判斷"""
+    t = np.arange(SAMPLE_RATE) / SAMPLE_RATE
+    mono = np.where(t >= 0.5, 0.5 * np.sin(2 * np.pi * 440 * t), 0.0).astype(np.float32)
+    processor = AudioProcessor()
+
+    frames = processor._detect_speech_frames(mono, SAMPLE_RATE)
+    assert frames == processor._detect_speech_frames(np.stack([mono, mono], axis=1), SAMPLE_RATE)
+    assert not any(frames[:16]) and all(frames[17:])
+
+
+def test_webrtc_frames_match_pydub_conversion(monkeypatch, tmp_path):
+    """WebRTC VAD 的輸入（降混、重取樣到 16kHz、16-bit）與原本經 pydub 轉換的判斷一致
+
+    resample_poly 含抗混疊濾波，與 pydub 的線性重取樣只在語音邊界的個別幀可能不同。
+    """
+    webrtcvad = pytest.importorskip("webrtcvad")
+    from pydub import AudioSegment
+    monkeypatch.setattr(audio_processor, "WEBRTCVAD_AVAILABLE", True)
+
+    rng = np.random.default_rng(0)
+    samples = np.zeros((3 * SAMPLE_RATE, 2))
+    voiced = slice(SAMPLE_RATE // 2, 3 * SAMPLE_RATE // 2)
+    samples[voiced] = 0.3 * rng.standard_normal((SAMPLE_RATE, 2)) * \
+        np.sin(2 * np.pi * 5 * np.arange(SAMPLE_RATE) / SAMPLE_RATE)[:, None]
+    path = tmp_path / "noise.wav"
+    wavfile.write(path, SAMPLE_RATE, (samples * 32767).astype(np.int16))
+
+    raw = AudioSegment.from_wav(path).set_channels(1).set_sample_width(2).set_frame_rate(16000).raw_data
+    vad = webrtcvad.Vad(2)
+    frame_bytes = 480 * 2
+    expected = [vad.is_speech(raw[offset:offset + frame_bytes], 16000)
+                for offset in range(0, len(raw) - frame_bytes + 1, frame_bytes)]
+
+    frames = AudioProcessor()._detect_speech_frames(*audio_processor.load_wav_np(str(path)))
+    assert len(frames) == len(expected)
+    assert sum(a != b for a, b in zip(frames, expected)) <= 2
+    assert any(frames)
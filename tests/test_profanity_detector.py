@@ -0,0 +1,117 @@
+# test_profanity_detector.py - 特殊詞語檢測器測試
+import random
+import re
+
+import pytest
+
+import profanity_detector
+from profanity_detector import (
+    PUNCTUATION_TABLE, ProfanityDetector, _DEFAULT_PATTERNS, _DEFAULT_PROFANITY,
+    _PunctuationTable, _SubsequenceScanner, _build_trie, _trie_find_all, _trie_find_first,
+)
+
+# 隨機文字使用的字元：詞庫與模式用字、常見字、標點與換行
+_CHARS = "幹你娘操媽北靠老師泥妳草馬母乾干考杯甘霖哩涼尼的是我好cabeio，。！？ \n"
+
+
+def _random_texts(count: int, seed: int = 0):
+    rng = random.Random(seed)
+    return ["".join(rng.choice(_CHARS) for _ in range(rng.randint(0, 40))) for _ in range(count)]
+
+
+def test_fuzzy_matches_spaced_profanity():
+    """模糊匹配需返回結果（曾因結尾的空 return 永遠返回 None）"""
+    detector = ProfanityDetector()
+    assert detector.detect_profanity_fuzzy("幹 你 娘") == ["幹你娘"]
+
+
+def test_trie_matches_substring_search():
+    """字典樹找到的詞語與逐詞 `in` 搜尋相同，依開始位置、再依長度排序"""
+    trie = _build_trie(_DEFAULT_PROFANITY)
+    for text in _random_texts(2000):
+        expected = [word for word in _DEFAULT_PROFANITY if word in text]
+        expected.sort(key=lambda word: (text.find(word), len(word)))
+        assert _trie_find_all(trie, text) == expected
+        assert _trie_find_first(trie, text) == (expected[0] if expected else None)
+
+
+def test_detector_words_match_substring_search():
+    """詞庫匹配（自動機或字典樹）與逐詞搜尋找到相同的詞語"""
+    detector = ProfanityDetector()
+    for text in _random_texts(500, seed=1):
+        assert set(detector.detect_profanity_basic(text)) == {word for word in _DEFAULT_PROFANITY if word in text}
+
+
+def _regex_hits(text: str):
+    """原本的做法：逐一以 re.search 檢查模式，返回命中的模式編號"""
+    patterns = [pattern for _, profanity_patterns in _DEFAULT_PATTERNS for pattern in profanity_patterns]
+    return [i for i, pattern in enumerate(patterns) if re.search(pattern, text)]
+
+
+@pytest.mark.parametrize("batch", [False, True])
+def test_scanner_matches_regex_patterns(batch):
+    """子序列掃描與原本的正則模式結果相同（".*" 不跨越換行）"""
+    scanner = _SubsequenceScanner(dict(_DEFAULT_PATTERNS))
+    texts = _random_texts(max(3000, scanner.NATIVE_MIN_TEXTS), seed=2)
+    texts += ["幹\n你娘", "幹你\n娘", "操\n你媽\n操你媽", "靠\n北"]
+
+    hits = scanner.scan(texts) if batch else [scanner.scan([text])[0] for text in texts]
+    assert hits == [_regex_hits(text) for text in texts]
+
+
+def test_scanner_does_not_match_across_newlines():
+    """與正則相同，模式的片段須出現在同一行"""
+    scanner = _SubsequenceScanner(dict(_DEFAULT_PATTERNS))
+    assert scanner.first_match("幹\n娘") is None
+    assert scanner.first_match("靠\n靠北") == "靠北"
+
+
+def test_modified_patterns_take_effect():
+    """修改 profanity_patterns 後重新檢測，且不影響其他實例"""
+    detector, other = ProfanityDetector(), ProfanityDetector()
+    assert detector.detect_profanity("你好呀")['found_profanity'] == []
+
+    detector.profanity_patterns["測試"] = [r"你.*呀"]
+    assert detector.detect_profanity("你好呀")['found_profanity'] == ["測試"]
+    assert other.detect_profanity("你好呀")['found_profanity'] == []
+
+
+@pytest.mark.parametrize("text", [
+    "幹，你！娘？",
+    "「操你媽」。、《靠北》",
+    "ＡＢＣ！１２３？（全形）",
+    "×÷±§¶•…‼※♪♫",
+    "é ä\x07\x1b_底線",
+    "😀 👍🏻 ★☆",
+    "tab\tnew\nline　full nbsp",
+])
+def test_punctuation_table_matches_regex(text):
+    """標點刪除表與 re.sub(r'[^\\w\\s]', '', ...) 結果相同"""
+    assert text.translate(PUNCTUATION_TABLE) == re.sub(r'[^\w\s]', '', text)
+
+
+def test_punctuation_table_matches_regex_for_all_code_points():
+    """逐一檢查所有碼位（使用新的表，不把共用表展開到整個 Unicode 範圍）"""
+    text = "".join(chr(code) for code in range(0x110000) if not 0xD800 <= code < 0xE000)
+    assert text.translate(_PunctuationTable()) == re.sub(r'[^\w\s]', '', text)
+
+
+def test_batch_matches_per_text_detection():
+    """批次檢測與逐段 detect_profanity 結果相同"""
+    detector = ProfanityDetector()
+    texts = _random_texts(300, seed=3) + ["", "幹你娘", "幹你娘", "Hello"]
+
+    batch_results = detector.detect_profanity_batch(texts)
+    single_results = [detector.detect_profanity(text) for text in texts]
+    for batch_result, single_result in zip(batch_results, single_results):
+        assert sorted(batch_result['found_profanity']) == sorted(single_result['found_profanity'])
+        assert batch_result['confidence'] == pytest.approx(single_result['confidence'])
+        assert batch_result['methods_used'] == single_result['methods_used']
+
+
+def test_batch_without_numba_matches(monkeypatch):
+    """未安裝 Numba 時的純 Python 掃描結果相同"""
+    monkeypatch.setattr(profanity_detector, "NUMBA_AVAILABLE", False)
+    scanner = _SubsequenceScanner(dict(_DEFAULT_PATTERNS))
+    texts = _random_texts(200, seed=4)
+    assert scanner.scan(texts) == [_regex_hits(text) for text in texts]
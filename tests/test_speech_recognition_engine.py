@@ -0,0 +1,28 @@
+# test_speech_recognition_engine.py - 重複片段偵測測試
+import random
+
+import numpy as np
+import pytest
+
+from speech_recognition_engine import _find_repeat, _find_repeat_numpy
+
+
+@pytest.mark.parametrize("tokens, expected", [
+    ([0, 1, 0, 1, 0, 1], (0, 2, 6)),
+    ([5, 0, 1, 0, 1, 0, 1, 0, 1, 6], (1, 2, 9)),
+    ([0, 1, 2, 0, 1, 2, 0, 1, 2, 0], (0, 3, 9)),
+    ([0, 1, 0, 1, 2], (-1, 0, 0)),
+    ([], (-1, 0, 0)),
+])
+def test_find_repeat_numpy_examples(tokens, expected):
+    assert _find_repeat_numpy(np.asarray(tokens, dtype=np.int64)) == expected
+    assert _find_repeat(tokens) == expected
+
+
+def test_find_repeat_numpy_matches_loop():
+    """向量化版本與原本的逐段比較迴圈結果相同"""
+    rng = random.Random(0)
+    for _ in range(2000):
+        vocabulary = rng.randint(1, 4)
+        tokens = [rng.randrange(vocabulary) for _ in range(rng.randint(0, 30))]
+        assert _find_repeat_numpy(np.asarray(tokens, dtype=np.int64)) == _find_repeat(tokens)
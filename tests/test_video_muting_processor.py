@@ -0,0 +1,34 @@
+# test_video_muting_processor.py - 消音區間合併測試
+import random
+
+from video_muting_processor import _merge_intervals
+
+
+def _segments(*intervals):
+    return [{'start_time': start, 'end_time': end} for start, end in intervals]
+
+
+def test_merge_overlapping_and_touching_intervals():
+    segments = _segments((5.0, 6.0), (1.0, 2.0), (1.5, 3.0), (3.0, 4.0), (7.0, 8.0), (7.2, 7.5))
+    assert _merge_intervals(segments) == [(1.0, 4.0), (5.0, 6.0), (7.0, 8.0)]
+
+
+def test_merge_empty():
+    assert _merge_intervals([]) == []
+
+
+def test_merged_intervals_cover_the_same_times():
+    """合併後的區間互不重疊，且每個時間點是否消音與合併前相同"""
+    rng = random.Random(0)
+    for _ in range(200):
+        intervals = []
+        for _ in range(rng.randint(1, 12)):
+            start = rng.randint(0, 100) / 4
+            intervals.append((start, start + rng.randint(0, 20) / 4))
+        merged = _merge_intervals(_segments(*intervals))
+
+        assert all(end < next_start for (_, end), (next_start, _) in zip(merged, merged[1:]))
+        for tick in range(0, 130 * 8):
+            t = tick / 8
+            assert any(start <= t <= end for start, end in intervals) == \
+                any(start <= t <= end for start, end in merged)